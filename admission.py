@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Render Admission Control
+Caps in-flight render cost (frames x pixels) and sheds load when the wait queue is full
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+class Overloaded(Exception):
+    """Raised when a render cannot be admitted; retry_after is in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RenderBudget:
+    """
+    FIFO admission of renders against a pixel budget
+    A render is admitted immediately when nothing is queued and its cost
+    fits; otherwise it waits in a bounded queue for up to max_wait seconds.
+    A single render costing more than the whole budget runs alone
+    """
+
+    def __init__(self, max_cost, max_queue=32, max_wait=10.0):
+        self.max_cost = max_cost
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.in_flight_cost = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def retry_after(self):
+        return max(1, math.ceil(self.max_wait))
+
+    def _fits(self, cost):
+        return self.in_flight == 0 or self.in_flight_cost + cost <= self.max_cost
+
+    def acquire(self, cost):
+        """Block until cost fits the budget, raising Overloaded when shed"""
+        cost = min(cost, self.max_cost)
+        with self._cond:
+            if not self._waiters and self._fits(cost):
+                self._admit(cost)
+                return cost
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(f"render queue full ({self.max_queue} waiting)", self.retry_after)
+
+            ticket = object()
+            self._waiters.append(ticket)
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self._waiters[0] is not ticket or not self._fits(cost):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        self.timed_out += 1
+                        raise Overloaded(f"render queue wait exceeded {self.max_wait:g}s", self.retry_after)
+                    self._cond.wait(remaining)
+                self._admit(cost)
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+        return cost
+
+    def _admit(self, cost):
+        self.in_flight += 1
+        self.in_flight_cost += cost
+        self.admitted += 1
+
+    def release(self, cost):
+        """Return an admitted render's cost to the budget"""
+        with self._cond:
+            self.in_flight -= 1
+            self.in_flight_cost -= cost
+            self._cond.notify_all()
+
+    def guard(self, cost, produce):
+        """
+        Admit cost, then return produce()'s chunks wrapped so the budget is
+        held until the stream is exhausted or closed
+        """
+        held = self.acquire(cost)
+        try:
+            chunks = produce()
+        except BaseException:
+            self.release(held)
+            raise
+        stream = self._hold(held, chunks)
+        next(stream)
+        return stream
+
+    def _hold(self, cost, chunks):
+        try:
+            # Primed by guard() so closing before iteration still releases
+            yield
+            yield from chunks
+        finally:
+            self.release(cost)
+
+    def stats(self):
+        """Snapshot of budget usage and shed counts"""
+        with self._cond:
+            return {
+                'in_flight': self.in_flight,
+                'in_flight_cost': self.in_flight_cost,
+                'max_cost': self.max_cost,
+                'queue_depth': len(self._waiters),
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out
+            }
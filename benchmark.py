@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+Render Benchmarks
+Timing harness for the frame generator and GIF encoder
+
+Usage:
+    python benchmark.py palette --frames 24 --repeat 5
+    python benchmark.py encoding --json
+    python benchmark.py svg --frames 1000
+    python benchmark.py functions pipeline --output before.json
+    python benchmark.py functions pipeline --compare before.json
+    python benchmark.py renderers --diff-dir diffs/
+    RENDERER=raster python benchmark.py palette encoding formats   # without libcairo
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from statistics import mean, median
+
+from generate_marketing import DEFAULT_COMPANY, DEFAULT_SERVICES, FONT_NAMES, GEOMETRY_PATTERNS
+
+# Options as built by the server for a default request
+BASE_OPTIONS = {
+    'company': DEFAULT_COMPANY,
+    'services': DEFAULT_SERVICES,
+    'tagline': None,
+    'url': None,
+    'bg_color': None,
+    'text_color': None,
+    'accent_color': None,
+    'font': 'bold',
+    'geometry': 'mixed',
+    'palette': 'per-frame',
+    'contrast': 'auto'
+}
+
+# Result of suites that measure cairosvg itself when it cannot run
+CAIRO_SKIPPED = {'cairosvg': {'skipped': 'cairosvg/libcairo not available'}}
+
+def timed(fn, repeat):
+    """Run fn repeat times, returning (last result, list of seconds)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def latency_stats(seconds, unit='ms'):
+    """Mean and p50/p95/p99 of per-call timings in the given unit"""
+    scale = {'ms': 1e3, 'us': 1e6}[unit]
+    return {
+        f'mean_{unit}': mean(seconds) * scale,
+        f'p50_{unit}': percentile(seconds, 50) * scale,
+        f'p95_{unit}': percentile(seconds, 95) * scale,
+        f'p99_{unit}': percentile(seconds, 99) * scale
+    }
+
+def sample_frames(frames):
+    """Frame ids spread evenly over the frame space"""
+    step = max(3110400 // max(frames, 1), 1)
+    return list(range(0, 3110400, step))[:frames]
+
+def bench_functions(frames=24, repeat=5):
+    """Per-call latency of each pipeline stage on its own"""
+    from io import BytesIO
+
+    from PIL import Image
+
+    from generate_marketing import (
+        create_gradient, create_geometry_pattern, generate_marketing_svg,
+        get_frame_components
+    )
+    from gif_stream import stream_gif
+    from render import FRAME_HEIGHT, FRAME_WIDTH, HAS_CAIRO, rasterize_png
+
+    if not HAS_CAIRO:
+        return CAIRO_SKIPPED
+    frame_indices = sample_frames(frames)
+    options = dict(BASE_OPTIONS, total_frames=frames)
+    components = [get_frame_components(frame_id) for frame_id in frame_indices]
+    svgs = [generate_marketing_svg(frame_id, options).encode('utf-8') for frame_id in frame_indices]
+    pngs = [rasterize_png(frame_id, options) for frame_id in frame_indices]
+    images = [Image.open(BytesIO(png)).convert('RGB') for png in pngs]
+
+    def encode(img):
+        return b''.join(stream_gif([img], 1000, FRAME_WIDTH, FRAME_HEIGHT))
+
+    def decode(png):
+        img = Image.open(BytesIO(png))
+        img.load()
+
+    def rasterize(svg):
+        import cairosvg
+        return cairosvg.svg2png(bytestring=svg, output_width=FRAME_WIDTH, output_height=FRAME_HEIGHT)
+
+    stages = {
+        'components': [lambda f=f: get_frame_components(f) for f in frame_indices],
+        'gradient': [lambda c=c: create_gradient(c['hue'], c['bg_style'], 0.8) for c in components],
+        'geometry': [lambda c=c, i=i: create_geometry_pattern(c['geometry'], '#ffcc00', i) for i, c in enumerate(components)],
+        'svg': [lambda f=f: generate_marketing_svg(f, options) for f in frame_indices],
+        'rasterize': [lambda svg=svg: rasterize(svg) for svg in svgs],
+        'decode': [lambda png=png: decode(png) for png in pngs],
+        'encode': [lambda img=img: encode(img) for img in images]
+    }
+
+    results = {}
+    for name, calls in stages.items():
+        seconds = []
+        for _ in range(repeat):
+            for call in calls:
+                start = time.perf_counter()
+                call()
+                seconds.append(time.perf_counter() - start)
+        results[name] = dict(
+            latency_stats(seconds, 'us'),
+            calls=len(seconds),
+            per_sec=len(seconds) / sum(seconds) if sum(seconds) else 0.0
+        )
+    return results
+
+def pipeline_scenarios(frames):
+    """Representative /marketing.gif parameter sets"""
+    scenarios = {
+        'count=1': {'count': '1'},
+        'count=10': {'count': '10'},
+        'count=100': {'count': '100'},
+        'random': {'count': str(min(frames, 100)), 'random': 'true', 'seed': 'bench'},
+        'text': {'count': str(min(frames, 100)), 'tagline': 'Best Food in Town', 'url': 'example.com'}
+    }
+    for font in FONT_NAMES:
+        scenarios[f'font={font}'] = {'count': str(min(frames, 100)), 'font': font}
+    for geometry in GEOMETRY_PATTERNS:
+        scenarios[f'geometry={geometry}'] = {'count': str(min(frames, 100)), 'geometry': geometry}
+    return scenarios
+
+def bench_pipeline(frames=24, repeat=5):
+    """
+    End-to-end request latency from parameters to GIF bytes, cold frame cache
+    Peak memory is traced Python allocations during one extra run; pixel
+    buffers held by Pillow and process-pool workers are not included
+    """
+    from render import frame_cache, render_gif
+    from request_options import parse_marketing_request
+
+    results = {}
+    for name, params in pipeline_scenarios(frames).items():
+        frame_indices, options, duration, _ = parse_marketing_request(params)
+
+        def run():
+            frame_cache.clear()
+            return render_gif(frame_indices, options, duration)
+
+        data, seconds = timed(run, repeat)
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = dict(
+            latency_stats(seconds, 'ms'),
+            frames=len(frame_indices),
+            frames_per_s=len(frame_indices) / median(seconds) if median(seconds) else 0.0,
+            bytes=len(data),
+            peak_kb=peak // 1024
+        )
+    return results
+
+def bench_renderers(frames=24, repeat=5, diff_dir=None):
+    """
+    Per-frame render time of each renderer, and how far the raster renderer's
+    pixels are from cairosvg's (mean and max absolute channel difference,
+    PSNR). With diff_dir, also saves each frame side by side per renderer
+    """
+    from PIL import Image, ImageChops, ImageStat
+
+    from render import HAS_CAIRO, RENDERERS, rasterize_frame
+
+    if not HAS_CAIRO:
+        return CAIRO_SKIPPED
+    frame_indices = sample_frames(frames)
+    options = dict(BASE_OPTIONS, total_frames=frames, tagline='Best Food in Town', url='example.com')
+
+    images = {}
+    results = {}
+    for renderer in RENDERERS:
+        renderer_options = dict(options, renderer=renderer)
+        rendered, seconds = timed(
+            lambda: [rasterize_frame(f, renderer_options).convert('RGB') for f in frame_indices],
+            repeat
+        )
+        images[renderer] = rendered
+        results[renderer] = {'ms_per_frame': median(seconds) * 1000 / len(frame_indices)}
+
+    reference = images['cairosvg']
+    for renderer in RENDERERS:
+        errors = []
+        for ref, img in zip(reference, images[renderer]):
+            diff = ImageChops.difference(ref, img)
+            errors.append((sum(ImageStat.Stat(diff).mean) / 3, max(hi for _, hi in diff.getextrema()),
+                           sum(ImageStat.Stat(diff).rms) / 3))
+        mean_error = mean(e[0] for e in errors)
+        rms = mean(e[2] for e in errors)
+        results[renderer].update(
+            mean_abs_diff=mean_error,
+            max_abs_diff=max(e[1] for e in errors),
+            psnr_db=20 * math.log10(255 / rms) if rms else float('inf'),
+            speedup=results['cairosvg']['ms_per_frame'] / results[renderer]['ms_per_frame']
+        )
+
+    if diff_dir:
+        os.makedirs(diff_dir, exist_ok=True)
+        for frame_id, *row in zip(frame_indices, *(images[r] for r in RENDERERS)):
+            sheet = Image.new('RGB', (sum(img.width for img in row), row[0].height))
+            x = 0
+            for img in row:
+                sheet.paste(img, (x, 0))
+                x += img.width
+            sheet.save(os.path.join(diff_dir, f'{frame_id}.png'))
+    return results
+
+def bench_glow(frames=24, repeat=5):
+    """
+    Raster renderer per-frame time with glows blurred on every frame versus
+    drawn from the sprite cache (cold: first pass fills it, warm: all hits)
+    """
+    import raster
+
+    frame_indices = sample_frames(frames)
+    options = dict(BASE_OPTIONS, total_frames=frames)
+
+    def render():
+        return [raster.render_frame(f, options) for f in frame_indices]
+
+    saved = raster.GLOW_SPRITES
+    results = {}
+    try:
+        raster.GLOW_SPRITES = False
+        _, seconds = timed(render, repeat)
+        results['per-frame'] = {'ms_per_frame': median(seconds) * 1000 / frames}
+
+        raster.GLOW_SPRITES = True
+        raster.raster_cache.clear()
+        _, seconds = timed(render, 1)
+        results['sprites-cold'] = {'ms_per_frame': seconds[0] * 1000 / frames}
+        _, seconds = timed(render, repeat)
+        results['sprites-warm'] = {'ms_per_frame': median(seconds) * 1000 / frames}
+    finally:
+        raster.GLOW_SPRITES = saved
+
+    baseline = results['per-frame']['ms_per_frame']
+    for result in results.values():
+        result['saved_pct'] = 100 * (1 - result['ms_per_frame'] / baseline) if baseline else 0.0
+    return results
+
+def bench_surface(frames=24, repeat=5):
+    """Per-frame cost of the PNG round trip versus reading the cairo surface directly"""
+    from io import BytesIO
+
+    from PIL import Image, ImageChops
+
+    from render import HAS_CAIRO, RAW_SURFACE_SUPPORTED, rasterize_png, rasterize_surface
+
+    if not HAS_CAIRO:
+        return CAIRO_SKIPPED
+    if not RAW_SURFACE_SUPPORTED:
+        return {'surface': {'skipped': 'big-endian host'}}
+    frame_indices = sample_frames(frames)
+    options = dict(BASE_OPTIONS, total_frames=frames)
+
+    def via_png():
+        images = []
+        for frame_id in frame_indices:
+            img = Image.open(BytesIO(rasterize_png(frame_id, options)))
+            img.load()
+            images.append(img)
+        return images
+
+    def via_surface():
+        return [rasterize_surface(frame_id, options) for frame_id in frame_indices]
+
+    png_images, png_seconds = timed(via_png, repeat)
+    raw_images, raw_seconds = timed(via_surface, repeat)
+    identical = all(
+        ImageChops.difference(a.convert('RGBA'), b).getbbox() is None
+        for a, b in zip(png_images, raw_images)
+    )
+    png_ms = median(png_seconds) * 1000 / len(frame_indices)
+    raw_ms = median(raw_seconds) * 1000 / len(frame_indices)
+    return {
+        'png': {'ms_per_frame': png_ms, 'saving_ms': 0.0, 'identical': 'yes'},
+        'surface': {
+            'ms_per_frame': raw_ms,
+            'saving_ms': png_ms - raw_ms,
+            'identical': 'yes' if identical else 'no'
+        }
+    }
+
+def bench_palette(frames=24, repeat=5):
+    """Encode time and output size for each GIF palette mode"""
+    from gif_stream import stream_gif
+    from render import PALETTE_MODES, gif_palette, rasterize_frame
+
+    frame_indices = list(range(frames))
+    options = dict(BASE_OPTIONS, total_frames=frames)
+    images = [rasterize_frame(frame_id, options) for frame_id in frame_indices]
+    width, height = images[0].size
+
+    results = {}
+    for mode in PALETTE_MODES:
+        mode_options = dict(options, palette=mode)
+
+        def encode():
+            palette = gif_palette(images[0], frame_indices, mode_options)
+            return b''.join(stream_gif(images, 1000, width, height, palette=palette))
+
+        data, timings = timed(encode, repeat)
+        results[mode] = {
+            'encode_ms': median(timings) * 1000,
+            'ms_per_frame': median(timings) * 1000 / frames,
+            'bytes': len(data)
+        }
+
+    baseline = results['per-frame']['encode_ms']
+    for result in results.values():
+        result['saving_pct'] = 100 * (1 - result['encode_ms'] / baseline) if baseline else 0.0
+    return results
+
+def bench_encoding(frames=24, repeat=5):
+    """
+    Encode time and output size for full versus delta frame encoding, with
+    per-frame and global palettes, on sequential frames (whose hue shifts
+    every frame) and on same-hue frames that differ only in service text
+    """
+    from generate_marketing import encode_frame_id
+    from gif_stream import stream_gif
+    from render import ENCODING_MODES, gif_palette, rasterize_frame
+
+    frame_sets = {
+        'sequential': list(range(frames)),
+        'same-hue': [encode_frame_id(hue=120, service_idx=i % 3, time_slot=12) for i in range(frames)]
+    }
+    results = {}
+    for set_name, frame_indices in frame_sets.items():
+        options = dict(BASE_OPTIONS, total_frames=frames)
+        images = [rasterize_frame(frame_id, options) for frame_id in frame_indices]
+        width, height = images[0].size
+        for palette_mode in ('per-frame', 'global'):
+            for mode in ENCODING_MODES:
+                mode_options = dict(options, palette=palette_mode, encoding=mode)
+                palette = gif_palette(images[0], frame_indices, mode_options)
+
+                def encode():
+                    return b''.join(stream_gif(
+                        images, 1000, width, height, palette=palette, delta=mode == 'delta'
+                    ))
+
+                data, timings = timed(encode, repeat)
+                results[f"{set_name}/{palette_mode}/{mode}"] = {
+                    'encode_ms': median(timings) * 1000,
+                    'ms_per_frame': median(timings) * 1000 / frames,
+                    'bytes': len(data)
+                }
+
+    for label, result in results.items():
+        full = results[label.rsplit('/', 1)[0] + '/full']
+        result['size_pct'] = 100 * result['bytes'] / full['bytes'] if full['bytes'] else 0.0
+    return results
+
+def bench_formats(frames=24, repeat=5):
+    """Encode time and output size for GIF versus animated WebP and APNG"""
+    from gif_stream import stream_gif
+    from render import encode_animation, rasterize_frame
+
+    options = dict(BASE_OPTIONS, total_frames=frames)
+    images = [rasterize_frame(frame_id, options) for frame_id in range(frames)]
+    width, height = images[0].size
+
+    encoders = {
+        'gif': lambda: b''.join(stream_gif(images, 1000, width, height)),
+        'webp-lossy': lambda: encode_animation(images, 1000, 'webp', quality=80, effort=4),
+        'webp-lossy-fast': lambda: encode_animation(images, 1000, 'webp', quality=80, effort=0),
+        'webp-lossless': lambda: encode_animation(images, 1000, 'webp', lossless=True, effort=4),
+        'apng': lambda: encode_animation(images, 1000, 'apng', effort=4)
+    }
+
+    results = {}
+    for name, encode in encoders.items():
+        data, timings = timed(encode, repeat)
+        results[name] = {
+            'encode_ms': median(timings) * 1000,
+            'ms_per_frame': median(timings) * 1000 / frames,
+            'bytes': len(data)
+        }
+
+    gif = results['gif']
+    for result in results.values():
+        result['size_pct'] = 100 * result['bytes'] / gif['bytes'] if gif['bytes'] else 0.0
+    return results
+
+def bench_svg(frames=24, repeat=5):
+    """Per-frame SVG generation cost: f-string builder versus compiled template"""
+    from generate_marketing import generate_marketing_svg, generate_marketing_svg_bytes
+
+    frame_indices = list(range(0, 3110400, 3110400 // max(frames, 1)))[:frames]
+    variants = {
+        'default': dict(BASE_OPTIONS),
+        'full_text': dict(BASE_OPTIONS, tagline='Best Food in Town', url='example.com')
+    }
+
+    results = {}
+    for name, options in variants.items():
+        for frame_id in frame_indices:
+            assert generate_marketing_svg(frame_id, options).encode('utf-8') == \
+                generate_marketing_svg_bytes(frame_id, options)
+
+        def fstring():
+            return [generate_marketing_svg(f, options).encode('utf-8') for f in frame_indices]
+
+        def template():
+            return [generate_marketing_svg_bytes(f, options) for f in frame_indices]
+
+        _, before = timed(fstring, repeat)
+        _, after = timed(template, repeat)
+        before_us = median(before) * 1e6 / len(frame_indices)
+        after_us = median(after) * 1e6 / len(frame_indices)
+        results[name] = {
+            'fstring_us': before_us,
+            'template_us': after_us,
+            'speedup': before_us / after_us if after_us else 0.0
+        }
+    return results
+
+BENCHMARKS = {
+    'functions': bench_functions,
+    'renderers': bench_renderers,
+    'glow': bench_glow,
+    'surface': bench_surface,
+    'pipeline': bench_pipeline,
+    'svg': bench_svg,
+    'palette': bench_palette,
+    'encoding': bench_encoding,
+    'formats': bench_formats
+}
+
+def environment():
+    """Interpreter, library and host details recorded alongside results"""
+    import PIL
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pillow': PIL.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    }
+    try:
+        import cairosvg
+        info['cairosvg'] = getattr(cairosvg, '__version__', 'unknown')
+    except (ImportError, OSError):
+        info['cairosvg'] = None
+    try:
+        import resource
+        scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is KiB on Linux
+        info['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale // 1024
+    except ImportError:
+        pass
+    return info
+
+def print_table(name, results):
+    """Print one benchmark's results as an aligned table"""
+    print(f"\n{name}")
+    columns = sorted({key for row in results.values() for key in row})
+    width = max([12] + [len(label) + 2 for label in results])
+    print(f"{'':<{width}}" + ''.join(f"{column:>14}" for column in columns))
+    for label, row in results.items():
+        cells = ''.join(
+            f"{row[column]:>14.2f}" if isinstance(row.get(column), float) else f"{row.get(column, ''):>14}"
+            for column in columns
+        )
+        print(f"{label:<{width}}{cells}")
+
+def print_comparison(baseline, report):
+    """Print percentage change of every shared numeric result against a baseline report"""
+    for name, results in report.items():
+        previous = baseline.get(name)
+        if not isinstance(previous, dict) or name == 'environment':
+            continue
+        print(f"\n{name} (vs baseline)")
+        for label, row in results.items():
+            old_row = previous.get(label, {})
+            changes = [
+                f"{column} {100 * (value - old_row[column]) / old_row[column]:+.1f}%"
+                for column, value in row.items()
+                if isinstance(value, (int, float)) and isinstance(old_row.get(column), (int, float)) and old_row[column]
+            ]
+            if changes:
+                print(f"  {label}: {', '.join(changes)}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Dynamic Marketing GIF benchmarks')
+    parser.add_argument('benchmarks', nargs='*', help=f"any of: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--frames', type=int, default=24, help='frames per GIF')
+    parser.add_argument('--repeat', type=int, default=5, help='timed repetitions')
+    parser.add_argument('--json', action='store_true', help='emit JSON instead of tables')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    parser.add_argument('--compare', help='baseline JSON report to compare against')
+    parser.add_argument('--diff-dir', help='renderers: save cairosvg/raster frames side by side here')
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    names = args.benchmarks or list(BENCHMARKS)
+    extra = {'renderers': {'diff_dir': args.diff_dir}}
+    report = {
+        name: BENCHMARKS[name](frames=args.frames, repeat=args.repeat, **extra.get(name, {}))
+        for name in names
+    }
+    report['environment'] = environment()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name in names:
+            print_table(name, report[name])
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(json.load(f), {name: report[name] for name in names})
+
+if __name__ == '__main__':
+    main()
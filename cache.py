@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Render Cache
+Size-bounded LRU caches for finished GIFs, keyed on canonical request parameters
+"""
+
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Bump when generator or encoder output changes so stale disk entries are ignored
+CACHE_VERSION = 2
+
+def canonical_key(*parts):
+    """Build a stable SHA-256 key from JSON-serializable parts"""
+    payload = json.dumps(
+        [CACHE_VERSION, *parts],
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache bounded by total value size in bytes"""
+
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return cached value (marking it recently used) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Store value, evicting least recently used entries over budget"""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+        return True
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Snapshot of cache counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+def memoize(cache):
+    """
+    Decorator caching a function's results in an LRUCache, so the memory it
+    holds is bounded by bytes rather than by entry count. Keys are the
+    function name and positional arguments; None results are not cached
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def cached(*args):
+            key = (func.__name__, *args)
+            value = cache.get(key)
+            if value is None:
+                value = func(*args)
+                if value is not None:
+                    cache.put(key, value)
+            return value
+        return cached
+    return decorate
+
+class DiskCache:
+    """
+    On-disk LRU tier that survives restarts
+    Recency is tracked through file mtimes, so eviction order persists too
+    """
+
+    def __init__(self, directory, max_bytes, suffix='.bin'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.current_bytes = sum(size for _, size, _ in self._scan())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _scan(self):
+        """List (path, size, mtime) for every cache file"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key):
+        """Return cached bytes or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data):
+        """Atomically write bytes, then evict oldest files over budget"""
+        if len(data) > self.max_bytes:
+            return False
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            with self._lock:
+                try:
+                    self.current_bytes -= os.path.getsize(path)
+                except OSError:
+                    pass
+                os.replace(tmp_path, path)
+                self.current_bytes += len(data)
+                if self.current_bytes > self.max_bytes:
+                    self._evict()
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return False
+        return True
+
+    def _evict(self):
+        """Remove least recently used files until under budget (lock held)"""
+        entries = sorted(self._scan(), key=lambda e: e[2])
+        self.current_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.current_bytes <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                self.current_bytes -= size
+            except OSError:
+                pass
+
+class GifCache:
+    """Two-tier (memory, optional disk) cache of finished GIF bytes"""
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.memory = LRUCache(max_bytes)
+        self.disk = DiskCache(disk_dir, disk_max_bytes, suffix='.gif') if disk_dir else None
+
+    def get(self, key):
+        """Look up memory first, then disk (promoting disk hits to memory)"""
+        data = self.memory.get(key)
+        if data is not None or self.disk is None:
+            return data
+        data = self.disk.get(key)
+        if data is not None:
+            self.memory.put(key, data)
+        return data
+
+    def put(self, key, data):
+        """Store finished GIF bytes in every tier"""
+        self.memory.put(key, data)
+        if self.disk is not None:
+            self.disk.put(key, data)
+
+    def store_stream(self, key, chunks):
+        """Pass chunks through, caching the assembled bytes once the stream completes"""
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.put(key, b''.join(parts))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Layered Frame Compositor
+Builds frames from independently cached layers and alpha-blends them with NumPy
+
+A frame is a background plus single-color coverage layers, each cached under
+only the inputs that shape it:
+
+    background  bg_style and gradient stops (hue, bg_style, time slot)
+    geometry    geometry pattern (and index % 3 for mixed)
+    text        company, font, tagline and url
+    chrome      solar brightness (corners, separator, pulse rings, dots)
+    service     service text and font
+
+Colors are applied at blend time, so one coverage layer serves every hue.
+Layers are stacked so that overlapping layers of different colors keep the
+raster renderer's order; accent layers commute with each other. Every layer
+is also keyed on the output scale.
+
+The colored background changes with the hue on nearly every frame, so only its
+gradient field is cached (in the raster renderer). Coverage layers share one
+cache bounded by LAYER_CACHE_MAX_BYTES.
+"""
+
+import os
+
+import numpy as np
+from PIL import Image
+
+from cache import LRUCache, memoize
+from generate_marketing import DEFAULT_COMPANY, DEFAULT_SERVICES, FONT_STYLES, resolve_frame_colors
+from raster import (
+    CORNER_SHAPES, DOT_SHAPES, PULSE_INNER_SHAPES, PULSE_OUTER_SHAPES, SEPARATOR_SHAPES, frame_scale,
+    geometry_shapes, glow_sprite, paint, render_background, scaled_size, shape_mask, text_mask, to_rgb
+)
+
+def text_layout(company, service_text, font):
+    """(letter spacing, company size, service size) as generate_marketing_svg lays them out"""
+    spacing = float(FONT_STYLES[font]['spacing'].rstrip('px') or 0)
+    company_size = 36 if len(company) <= 20 else 28
+    service_size = 28 if len(service_text) <= 30 else 22
+    return spacing, company_size, service_size
+
+def coverage_nbytes(layer):
+    """Size of a sparse coverage layer's index and alpha arrays"""
+    indices, alpha = layer
+    return indices.nbytes + alpha.nbytes
+
+# Coverage layers per process; one glowing text layer at width 1600 is several MB
+layer_cache = LRUCache(
+    max_bytes=int(os.environ.get('LAYER_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    sizeof=coverage_nbytes
+)
+
+def coverage(mask):
+    """
+    Sparse coverage of a mask: (flat pixel indices, float alpha column) for
+    every covered pixel. Chrome and geometry are thin strokes spread over the
+    frame, so blending only covered pixels beats blending their bounding box
+    """
+    alpha = np.asarray(mask, dtype=np.uint8).ravel()
+    indices = np.flatnonzero(alpha)
+    return indices, (alpha[indices].astype(np.float32) / 255)[:, None]
+
+def paste_glow(mask, text, style, size, spacing, y, blur, scale):
+    """Add glowing text's coverage (sharp text over its blur) to mask"""
+    sprite = glow_sprite(' '.join(text.split()), style, size, spacing, y, blur, scale)
+    if sprite is not None:
+        mask.paste(255, sprite[1], sprite[0])
+
+def background_layer(bg_style, stops, scale):
+    """Background gradient as a writable RGB array, colored from the cached gradient field"""
+    return np.array(render_background(bg_style, stops, scale))
+
+@memoize(layer_cache)
+def geometry_layer(opacity, shapes, scale):
+    """Geometry pattern coverage"""
+    mask = Image.new('L', scaled_size(scale))
+    paint(mask, 255, shape_mask(shapes, scale), opacity)
+    return coverage(mask)
+
+@memoize(layer_cache)
+def chrome_layer(brightness, scale):
+    """Corners, separator, energy pulse and status dots: fixed shapes scaled by brightness"""
+    mask = Image.new('L', scaled_size(scale))
+    paint(mask, 255, shape_mask(CORNER_SHAPES, scale), 0.7)
+    paint(mask, 255, shape_mask(SEPARATOR_SHAPES, scale), brightness)
+    paint(mask, 255, shape_mask(PULSE_INNER_SHAPES, scale), brightness * 0.2)
+    paint(mask, 255, shape_mask(PULSE_OUTER_SHAPES, scale), brightness * 0.1)
+    paint(mask, 255, shape_mask(DOT_SHAPES, scale), brightness)
+    return coverage(mask)
+
+@memoize(layer_cache)
+def text_layer(company, font, tagline, url, scale):
+    """Company name with its glow, tagline and url: everything drawn in the text color"""
+    spacing, company_size, _ = text_layout(company, '', font)
+    mask = Image.new('L', scaled_size(scale))
+    paste_glow(mask, company, font, company_size, spacing, 180, 8, scale)
+    if tagline:
+        paint(mask, 255, text_mask(tagline, 'arial', 18, 0, 300, scale), 0.9)
+    if url:
+        paint(mask, 255, text_mask(url, 'arial', 14, 0, 330 if tagline else 300, scale), 0.8)
+    return coverage(mask)
+
+@memoize(layer_cache)
+def service_layer(service_text, font, scale):
+    """Current service with its glow"""
+    spacing, _, service_size = text_layout('', service_text, font)
+    mask = Image.new('L', scaled_size(scale))
+    paste_glow(mask, service_text, font, service_size, spacing, 250, 4, scale)
+    return coverage(mask)
+
+def blend(pixels, layer, color):
+    """Composite a solid color through a cached coverage layer into flat RGB pixels"""
+    indices, alpha = layer
+    under = pixels[indices].astype(np.float32)
+    under += (np.asarray(color, dtype=np.float32) - under) * alpha
+    pixels[indices] = np.rint(under)
+
+def render_frame(frame_index, options):
+    """Render one frame as an RGB image from cached layers"""
+    company = options.get('company', DEFAULT_COMPANY)
+    services = options.get('services', DEFAULT_SERVICES)
+
+    components, brightness, colors = resolve_frame_colors(frame_index, options)
+    accent = to_rgb(colors['accent'])
+    text_color = to_rgb(colors['text'])
+    font = components['font']
+    service_text = services[frame_index % len(services)]
+    scale = frame_scale(options)
+
+    frame = background_layer(components['bg_style'], colors['stops'], scale)
+    pixels = frame.reshape(-1, 3)
+    blend(pixels, geometry_layer(*geometry_shapes(components['geometry'], frame_index), scale), accent)
+    blend(pixels, text_layer(company, font, options.get('tagline'), options.get('url'), scale), text_color)
+    blend(pixels, chrome_layer(brightness, scale), accent)
+    blend(pixels, service_layer(service_text, font, scale), accent)
+    return Image.fromarray(frame, 'RGB')
+
+def cache_info():
+    """Hit/miss counts and bytes held by the layer cache"""
+    return layer_cache.stats()
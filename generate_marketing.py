@@ -8,6 +8,14 @@ import hashlib
 import math
 import random
 import colorsys
+from functools import lru_cache
+from string import Formatter
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
 
 # Default text values
 DEFAULT_COMPANY = "Auto_Workspace-AI"
@@ -42,6 +50,8 @@ FONT_STYLES = {
     }
 }
 
+FONT_NAMES = list(FONT_STYLES.keys())
+
 # Geometry patterns
 GEOMETRY_PATTERNS = ['sharp', 'round', 'mixed', 'minimal']
 
@@ -60,6 +70,7 @@ def hsl_to_rgb(h, s, l):
     r, g, b = colorsys.hls_to_rgb(h / 360.0, l, s)
     return f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}"
 
+@lru_cache(maxsize=4096)
 def calculate_luminance(hex_color):
     """Calculate relative luminance for contrast checking"""
     hex_color = hex_color.lstrip('#')
@@ -71,6 +82,7 @@ def calculate_luminance(hex_color):
     r, g, b = adjust(r), adjust(g), adjust(b)
     return 0.2126 * r + 0.7152 * g + 0.0722 * b
 
+@lru_cache(maxsize=4096)
 def ensure_contrast(bg_color, text_color=None, min_ratio=7.0):
     """
     Ensure text has sufficient contrast against background
@@ -94,6 +106,7 @@ def ensure_contrast(bg_color, text_color=None, min_ratio=7.0):
         # Dark background → light text
         return '#ffffff'
 
+@lru_cache(maxsize=4096)
 def parse_color(color_input):
     """Parse color from various formats"""
     if not color_input:
@@ -146,35 +159,143 @@ def get_frame_components(frame_id, total_frames=3110400):
         'geometry': GEOMETRY_PATTERNS[geometry_idx],
         'service_idx': service_idx,
         'time_slot': time_slot,
-        'font': list(FONT_STYLES.keys())[font_idx]
+        'font': FONT_NAMES[font_idx]
     }
 
+# Mixed-radix layout of the frame space: hue residue, bg style, geometry,
+# service, time slot, font
+FRAME_SPACE = 3110400
+HUE_MULTIPLIER = 37
+HUE_INVERSE = pow(HUE_MULTIPLIER, -1, 360)  # 37 is coprime to 360
+
+def get_frame_components_batch(frame_ids):
+    """
+    Decompose many frame IDs at once
+    Accepts a NumPy array or any sequence and returns column arrays of
+    component indices: hue, bg_style_idx, geometry_idx, service_idx,
+    time_slot, font_idx (plain lists when NumPy is unavailable)
+    """
+    if not HAS_NUMPY:
+        columns = {key: [] for key in ('hue', 'bg_style_idx', 'geometry_idx', 'service_idx', 'time_slot', 'font_idx')}
+        for frame_id in frame_ids:
+            columns['hue'].append((frame_id * HUE_MULTIPLIER) % 360)
+            columns['bg_style_idx'].append((frame_id // 360) % 6)
+            columns['geometry_idx'].append((frame_id // 2160) % 4)
+            columns['service_idx'].append((frame_id // 8640) % 3)
+            columns['time_slot'].append((frame_id // 25920) % 24)
+            columns['font_idx'].append((frame_id // 622080) % 5)
+        return columns
+    
+    ids = np.asarray(frame_ids, dtype=np.int64)
+    return {
+        'hue': (ids % 360) * HUE_MULTIPLIER % 360,
+        'bg_style_idx': ids // 360 % 6,
+        'geometry_idx': ids // 2160 % 4,
+        'service_idx': ids // 8640 % 3,
+        'time_slot': ids // 25920 % 24,
+        'font_idx': ids // 622080 % 5
+    }
+
+def _component_index(value, names):
+    """Map a component name to its index; indices (or index arrays) pass through"""
+    return names.index(value) if isinstance(value, str) else value
+
+def _check_component(name, value, count):
+    """Raise ValueError unless value (or every element of an index array) is an integer in 0..count-1"""
+    if isinstance(value, int):
+        out_of_range = not 0 <= value < count
+    elif HAS_NUMPY and np.issubdtype(np.asarray(value).dtype, np.integer):
+        values = np.asarray(value)
+        out_of_range = np.any((values < 0) | (values >= count))
+    else:
+        raise ValueError(f"'{name}' must be an integer index")
+    if out_of_range:
+        raise ValueError(f"'{name}' must be between 0-{count - 1}")
+
+def encode_frame_id(hue=0, bg_style=0, geometry=0, service_idx=0, time_slot=0, font=0):
+    """
+    Inverse of get_frame_components: build the frame ID with these components
+    bg_style, geometry and font take names or indices; every argument may
+    also be a NumPy array of indices to encode many combinations at once.
+    Raises ValueError for an unknown name or an index outside its component's range
+    """
+    bg_style = _component_index(bg_style, BG_STYLES)
+    geometry = _component_index(geometry, GEOMETRY_PATTERNS)
+    font = _component_index(font, FONT_NAMES)
+    for name, value, count in (
+        ('hue', hue, 360),
+        ('bg_style', bg_style, len(BG_STYLES)),
+        ('geometry', geometry, len(GEOMETRY_PATTERNS)),
+        ('service_idx', service_idx, 3),
+        ('time_slot', time_slot, 24),
+        ('font', font, len(FONT_NAMES))
+    ):
+        _check_component(name, value, count)
+    residue = hue * HUE_INVERSE % 360
+    return residue + 360 * (bg_style + 6 * (geometry + 4 * (service_idx + 3 * (time_slot + 24 * font))))
+
+def frame_cache_key(frame_index, options):
+    """
+    Key covering every option that affects a single frame's pixels
+    total_frames and contrast never reach the SVG, and only the service
+    shown in this frame matters, so frames are shared across compositions.
+    The renderer and output width are included because backends differ at
+    the pixel level and each size is cached as its own variant
+    """
+    services = options.get('services', DEFAULT_SERVICES)
+    return (
+        frame_index,
+        options.get('company', DEFAULT_COMPANY),
+        services[frame_index % len(services)],
+        options.get('tagline'),
+        options.get('url'),
+        options.get('bg_color'),
+        options.get('text_color'),
+        options.get('accent_color'),
+        options.get('font'),
+        options.get('geometry'),
+        options.get('renderer') or 'cairosvg',
+        options.get('width') or 400
+    )
+
 def calculate_solar_dampener(hour):
     """Calculate brightness based on time of day"""
     normalized = (hour - 6) / 12
     brightness = (math.sin(normalized * math.pi) + 1) / 2
     return max(0.2, min(1.0, brightness))
 
-def create_gradient(hue, bg_style, brightness):
-    """Create background gradient based on style"""
+def gradient_stops(hue, bg_style, brightness):
+    """Gradient stops as (offset percent, color) pairs for a background style"""
     base_color = hsl_to_rgb(hue, 0.7, 0.3 * brightness)
     accent_color = hsl_to_rgb((hue + 30) % 360, 0.6, 0.5 * brightness)
     
-    if bg_style == 'vertical':
-        return f'<linearGradient id="bg" x1="0%" y1="0%" x2="0%" y2="100%"><stop offset="0%" stop-color="{base_color}"/><stop offset="100%" stop-color="{accent_color}"/></linearGradient>'
-    elif bg_style == 'horizontal':
-        return f'<linearGradient id="bg" x1="0%" y1="0%" x2="100%" y2="0%"><stop offset="0%" stop-color="{base_color}"/><stop offset="100%" stop-color="{accent_color}"/></linearGradient>'
-    elif bg_style == 'diagonal':
-        return f'<linearGradient id="bg" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" stop-color="{base_color}"/><stop offset="100%" stop-color="{accent_color}"/></linearGradient>'
-    elif bg_style == 'radial':
-        return f'<radialGradient id="bg"><stop offset="0%" stop-color="{accent_color}"/><stop offset="100%" stop-color="{base_color}"/></radialGradient>'
+    if bg_style == 'radial':
+        return [(0, accent_color), (100, base_color)]
     elif bg_style == 'double':
         mid_color = hsl_to_rgb((hue + 15) % 360, 0.65, 0.4 * brightness)
-        return f'<linearGradient id="bg" x1="0%" y1="0%" x2="0%" y2="100%"><stop offset="0%" stop-color="{base_color}"/><stop offset="50%" stop-color="{mid_color}"/><stop offset="100%" stop-color="{accent_color}"/></linearGradient>'
-    else:  # triple
+        return [(0, base_color), (50, mid_color), (100, accent_color)]
+    elif bg_style == 'triple':
         mid1 = hsl_to_rgb((hue + 10) % 360, 0.7, 0.35 * brightness)
         mid2 = hsl_to_rgb((hue + 20) % 360, 0.65, 0.45 * brightness)
-        return f'<linearGradient id="bg" x1="0%" y1="0%" x2="0%" y2="100%"><stop offset="0%" stop-color="{base_color}"/><stop offset="33%" stop-color="{mid1}"/><stop offset="66%" stop-color="{mid2}"/><stop offset="100%" stop-color="{accent_color}"/></linearGradient>'
+        return [(0, base_color), (33, mid1), (66, mid2), (100, accent_color)]
+    else:  # vertical, horizontal, diagonal
+        return [(0, base_color), (100, accent_color)]
+
+def create_gradient(hue, bg_style, brightness):
+    """Create background gradient based on style"""
+    stops = ''.join(
+        f'<stop offset="{offset}%" stop-color="{color}"/>'
+        for offset, color in gradient_stops(hue, bg_style, brightness)
+    )
+    
+    if bg_style == 'horizontal':
+        return f'<linearGradient id="bg" x1="0%" y1="0%" x2="100%" y2="0%">{stops}</linearGradient>'
+    elif bg_style == 'diagonal':
+        return f'<linearGradient id="bg" x1="0%" y1="0%" x2="100%" y2="100%">{stops}</linearGradient>'
+    elif bg_style == 'radial':
+        return f'<radialGradient id="bg">{stops}</radialGradient>'
+    else:  # vertical, double, triple
+        return f'<linearGradient id="bg" x1="0%" y1="0%" x2="0%" y2="100%">{stops}</linearGradient>'
 
 def create_geometry_pattern(geometry, accent_color, index):
     """Create geometric tracer patterns"""
@@ -231,6 +352,85 @@ def create_geometry_pattern(geometry, accent_color, index):
             </g>
             '''
 
+# Default-path colors for every (time slot, bg style, hue), indexed as a flat
+# list and filled lazily: the whole input domain is only 24 x 6 x 360 entries
+_BG_STYLE_INDEX = {style: i for i, style in enumerate(BG_STYLES)}
+_COLOR_TABLE = [None] * (24 * len(BG_STYLES) * 360)
+
+def _build_color_entry(hue, bg_style_idx, time_slot):
+    """Brightness, gradient stops, background base, accent and text color"""
+    brightness = calculate_solar_dampener(time_slot)
+    bg_base = hsl_to_rgb(hue, 0.7, 0.3 * brightness)
+    return (
+        brightness,
+        tuple(gradient_stops(hue, BG_STYLES[bg_style_idx], brightness)),
+        bg_base,
+        hsl_to_rgb((hue + 120) % 360, 0.8, 0.6),
+        ensure_contrast(bg_base)
+    )
+
+def frame_color_entry(hue, bg_style_idx, time_slot):
+    """Look up (building on first use) the default colors for a frame"""
+    index = (time_slot * len(BG_STYLES) + bg_style_idx) * 360 + hue
+    entry = _COLOR_TABLE[index]
+    if entry is None:
+        entry = _COLOR_TABLE[index] = _build_color_entry(hue, bg_style_idx, time_slot)
+    return entry
+
+def build_color_tables():
+    """Fill the whole color table up front, e.g. before forking server workers"""
+    for time_slot in range(24):
+        for bg_style_idx in range(len(BG_STYLES)):
+            for hue in range(360):
+                frame_color_entry(hue, bg_style_idx, time_slot)
+
+def resolve_frame_colors(frame_index, options):
+    """
+    Resolve frame components (with font/geometry overrides), solar brightness
+    and every color a frame uses: gradient stops, background base, accent
+    and contrast-enforced text color
+    """
+    components = get_frame_components(frame_index)
+    
+    # Override with user preferences
+    if options.get('font'):
+        components['font'] = options['font']
+    if options.get('geometry'):
+        components['geometry'] = options['geometry']
+    
+    brightness, stops, default_bg, default_accent, default_text = frame_color_entry(
+        components['hue'],
+        _BG_STYLE_INDEX[components['bg_style']],
+        components['time_slot']
+    )
+    
+    # Get colors
+    bg_base = default_bg
+    if options.get('bg_color'):
+        bg_base = parse_color(options['bg_color']) or default_bg
+    
+    # Accent color
+    accent = default_accent
+    if options.get('accent_color'):
+        accent = parse_color(options['accent_color']) or default_accent
+    
+    # Text color with contrast enforcement
+    if options.get('text_color'):
+        text_color_base = parse_color(options['text_color'])
+        text_color = ensure_contrast(bg_base, text_color_base)
+    elif bg_base == default_bg:
+        text_color = default_text
+    else:
+        text_color = ensure_contrast(bg_base)
+    
+    colors = {
+        'stops': stops,
+        'bg_base': bg_base,
+        'accent': accent,
+        'text': text_color
+    }
+    return components, brightness, colors
+
 def generate_marketing_svg(frame_index, options):
     """
     Generate complete marketing frame
@@ -254,43 +454,14 @@ def generate_marketing_svg(frame_index, options):
     services = options.get('services', DEFAULT_SERVICES)
     tagline = options.get('tagline')
     url = options.get('url')
-    font_override = options.get('font')
-    geometry_override = options.get('geometry')
     
-    # Get frame components
-    components = get_frame_components(frame_index)
-    
-    # Override with user preferences
-    if font_override:
-        components['font'] = font_override
-    if geometry_override:
-        components['geometry'] = geometry_override
-    
-    # Calculate brightness
-    brightness = calculate_solar_dampener(components['time_slot'])
-    
-    # Get colors
-    if options.get('bg_color'):
-        bg_base = parse_color(options['bg_color']) or hsl_to_rgb(components['hue'], 0.7, 0.3 * brightness)
-    else:
-        bg_base = hsl_to_rgb(components['hue'], 0.7, 0.3 * brightness)
+    components, brightness, colors = resolve_frame_colors(frame_index, options)
+    accent = colors['accent']
+    text_color = colors['text']
     
     # Create gradient
     gradient = create_gradient(components['hue'], components['bg_style'], brightness)
     
-    # Accent color
-    if options.get('accent_color'):
-        accent = parse_color(options['accent_color']) or hsl_to_rgb((components['hue'] + 120) % 360, 0.8, 0.6)
-    else:
-        accent = hsl_to_rgb((components['hue'] + 120) % 360, 0.8, 0.6)
-    
-    # Text color with contrast enforcement
-    if options.get('text_color'):
-        text_color_base = parse_color(options['text_color'])
-        text_color = ensure_contrast(bg_base, text_color_base)
-    else:
-        text_color = ensure_contrast(bg_base)
-    
     # Get service for this frame
     service_idx = frame_index % len(services)
     service_text = services[service_idx]
@@ -403,3 +574,196 @@ def generate_marketing_svg(frame_index, options):
 </svg>'''
     
     return svg
+
+# Frame SVG template compiled once: static segments are pre-encoded as bytes
+# and only the {slot} fields are filled per frame. Must stay in step with
+# generate_marketing_svg, whose output it reproduces byte for byte
+FRAME_SVG_TEMPLATE = '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 400 480">
+    <defs>
+        {gradient}
+        <filter id="glow">
+            <feGaussianBlur stdDeviation="4" result="coloredBlur"/>
+            <feMerge>
+                <feMergeNode in="coloredBlur"/>
+                <feMergeNode in="SourceGraphic"/>
+            </feMerge>
+        </filter>
+        <filter id="strong-glow">
+            <feGaussianBlur stdDeviation="8" result="coloredBlur"/>
+            <feMerge>
+                <feMergeNode in="coloredBlur"/>
+                <feMergeNode in="SourceGraphic"/>
+            </feMerge>
+        </filter>
+    </defs>
+    
+    <!-- Background -->
+    <rect width="400" height="480" fill="url(#bg)"/>
+    
+    <!-- Geometry patterns -->
+    {geometry}
+    
+    <!-- Tech corners -->
+    <g stroke="{accent}" stroke-width="2" fill="none" opacity="0.7">
+        <path d="M 20 20 L 60 20 L 60 60"/>
+        <path d="M 380 20 L 340 20 L 340 60"/>
+        <path d="M 20 460 L 60 460 L 60 420"/>
+        <path d="M 380 460 L 340 460 L 340 420"/>
+    </g>
+    
+    <!-- Company name -->
+    <text x="200" y="180" text-anchor="middle" 
+          font-family="{font_family}" 
+          font-weight="{font_weight}" 
+          letter-spacing="{letter_spacing}"
+          font-size="{company_size}" fill="{text_color}" 
+          filter="url(#strong-glow)">
+        {company}
+    </text>
+    
+    <!-- Separator line -->
+    <line x1="80" y1="200" x2="320" y2="200" stroke="{accent}" stroke-width="2" opacity="{brightness}"/>
+    
+    <!-- Service -->
+    <text x="200" y="250" text-anchor="middle" 
+          font-family="{font_family}" 
+          font-size="{service_size}" fill="{accent}" 
+          filter="url(#glow)">
+        {service_text}
+    </text>{tagline_block}{url_block}
+    
+    <!-- Energy effects -->
+    <circle cx="200" cy="240" r="120" fill="none" 
+            stroke="{accent}" stroke-width="1" 
+            opacity="{inner_pulse_opacity}"/>
+    <circle cx="200" cy="240" r="140" fill="none" 
+            stroke="{accent}" stroke-width="1" 
+            opacity="{outer_pulse_opacity}"/>
+    
+    <!-- Status dots -->
+    <g fill="{accent}" opacity="{brightness}">
+        <circle cx="200" cy="360" r="3"/>
+        <circle cx="180" cy="360" r="2"/>
+        <circle cx="220" cy="360" r="2"/>
+    </g>
+</svg>'''
+
+TAGLINE_SVG_TEMPLATE = '''
+    
+    <!-- Tagline -->
+    <text x="200" y="300" text-anchor="middle" 
+          font-family="Arial" font-size="18" fill="{text_color}" 
+          opacity="0.9">
+        {tagline}
+    </text>'''
+
+URL_SVG_TEMPLATE = '''
+    
+    <!-- URL -->
+    <text x="200" y="{url_y}" text-anchor="middle" 
+          font-family="Arial" font-size="14" fill="{text_color}" 
+          opacity="0.8">
+        {url}
+    </text>'''
+
+def compile_template(template):
+    """
+    Compile a str.format template into a bytes %-format (static segments
+    pre-encoded, one %s per slot) plus the ordered slot names
+    """
+    segments = []
+    fields = []
+    for literal, field, _, _ in Formatter().parse(template):
+        segments.append(literal.encode('utf-8').replace(b'%', b'%%'))
+        if field is not None:
+            segments.append(b'%s')
+            fields.append(field)
+    return b''.join(segments), tuple(fields)
+
+def fill_template(compiled, values):
+    """Fill a compiled template's slots (bytes values are used as-is)"""
+    fmt, fields = compiled
+    return fmt % tuple(
+        value if isinstance(value, bytes) else str(value).encode('utf-8')
+        for value in map(values.__getitem__, fields)
+    )
+
+# One compiled variant per (has tagline, has URL) so each frame is a single fill
+_FRAME_SVG = {
+    (has_tagline, has_url): compile_template(
+        FRAME_SVG_TEMPLATE
+        .replace('{tagline_block}', TAGLINE_SVG_TEMPLATE if has_tagline else '')
+        .replace('{url_block}', URL_SVG_TEMPLATE if has_url else '')
+    )
+    for has_tagline in (False, True)
+    for has_url in (False, True)
+}
+
+@lru_cache(maxsize=4096)
+def _gradient_bytes(hue, bg_style, brightness):
+    """Encoded background gradient, shared by every frame with the same inputs"""
+    return create_gradient(hue, bg_style, brightness).encode('utf-8')
+
+@lru_cache(maxsize=1024)
+def _geometry_bytes(geometry, accent_color, pattern_index):
+    """Encoded geometry pattern; only the mixed style varies with frame index"""
+    return create_geometry_pattern(geometry, accent_color, pattern_index).encode('utf-8')
+
+@lru_cache(maxsize=None)
+def _font_bytes(font):
+    """Encoded font attributes for a font style"""
+    style = FONT_STYLES[font]
+    return tuple(style[key].encode('utf-8') for key in ('family', 'weight', 'spacing'))
+
+@lru_cache(maxsize=256)
+def _brightness_bytes(brightness):
+    """Encoded brightness-derived opacities: separator/dots, inner and outer pulse"""
+    return tuple(str(value).encode('utf-8') for value in (brightness, brightness * 0.2, brightness * 0.1))
+
+def generate_marketing_svg_bytes(frame_index, options):
+    """
+    Generate complete marketing frame as UTF-8 bytes from the compiled template
+    Output equals generate_marketing_svg(frame_index, options).encode('utf-8')
+    and can be passed straight to cairosvg.svg2png(bytestring=...)
+    """
+    company = options.get('company', DEFAULT_COMPANY)
+    services = options.get('services', DEFAULT_SERVICES)
+    tagline = options.get('tagline')
+    url = options.get('url')
+    
+    components, brightness, colors = resolve_frame_colors(frame_index, options)
+    accent = colors['accent']
+    text_color = colors['text']
+    service_text = services[frame_index % len(services)]
+    font_family, font_weight, letter_spacing = _font_bytes(components['font'])
+    opacity, inner_pulse_opacity, outer_pulse_opacity = _brightness_bytes(brightness)
+    
+    values = {
+        'gradient': _gradient_bytes(components['hue'], components['bg_style'], brightness),
+        'geometry': _geometry_bytes(
+            components['geometry'], accent,
+            frame_index % 3 if components['geometry'] == 'mixed' else 0
+        ),
+        'accent': accent,
+        'font_family': font_family,
+        'font_weight': font_weight,
+        'letter_spacing': letter_spacing,
+        'company_size': 36 if len(company) <= 20 else 28,
+        'text_color': text_color,
+        'company': company,
+        'brightness': opacity,
+        'service_size': 28 if len(service_text) <= 30 else 22,
+        'service_text': service_text,
+        'tagline': tagline,
+        'url_y': 330 if tagline else 300,
+        'url': url,
+        'inner_pulse_opacity': inner_pulse_opacity,
+        'outer_pulse_opacity': outer_pulse_opacity
+    }
+    
+    return fill_template(_FRAME_SVG[bool(tagline), bool(url)], values)
+
+if __name__ == '__main__':
+    # Command-line pre-rendering lives in prerender.py
+    from prerender import main
+    main()
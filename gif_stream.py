@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Streaming GIF Encoder
+Writes the GIF header up front, then one image block per frame as it is rendered
+"""
+
+import struct
+from functools import reduce
+
+from PIL import GifImagePlugin, Image, ImageChops
+
+from metrics import timed_stage
+
+# Palette index reserved for "unchanged" pixels in delta frames
+TRANSPARENT_INDEX = 255
+
+# GIF disposal: leave the frame in place for the next one to draw over
+DISPOSAL_KEEP = 1
+
+# Delta frames with fewer unchanged pixels than this share of their changed
+# box are written opaque: transparency would cost an extra pass for no savings
+MIN_UNCHANGED_SHARE = 0.1
+
+# Point table turning a change mask into a mask of unchanged pixels
+UNCHANGED_TABLE = [255] + [0] * 255
+
+def palette_indices(img):
+    """A palette image's raw indices as an 'L' image"""
+    return Image.frombytes('L', img.size, img.tobytes())
+
+class StreamingGifWriter:
+    """
+    Incremental GIF89a writer holding at most one frame at a time
+    With a palette image, all frames are mapped onto one global color table;
+    otherwise each frame gets its own adaptive local color table. In delta
+    mode each frame after the first only carries the bounding box of pixels
+    that changed, with unchanged pixels transparent, and frames are never
+    disposed so each one draws over the last. With a shared palette, change
+    is measured on palette indices, so a color that shifted but maps to the
+    same entry still counts as unchanged
+    """
+
+    def __init__(self, width, height, duration, loop=0, palette=None, delta=False):
+        self.width = width
+        self.height = height
+        self.duration = duration
+        self.loop = loop
+        self.palette = palette
+        self.delta = delta
+        self.previous = None
+
+    def header(self):
+        """Signature, logical screen descriptor, global color table and looping extension"""
+        if self.palette is not None:
+            color_table = self.palette.getpalette()[:768]
+            color_table = bytes(color_table) + bytes(768 - len(color_table))
+            flags = 0x80 | 7  # global color table of 256 entries
+        else:
+            color_table = b''
+            flags = 0
+        return (
+            b'GIF89a'
+            + struct.pack('<HHBBB', self.width, self.height, flags, 0, 0)
+            + color_table
+            + b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', self.loop) + b'\x00'
+        )
+
+    def quantize(self, img):
+        """Reduce an RGB(A) frame to a palette image"""
+        if img.mode == 'P':
+            return img
+        if self.palette is not None:
+            # Map straight onto the shared palette without rebuilding one
+            return img.convert('RGB').quantize(palette=self.palette, dither=Image.Dither.NONE)
+        # Delta frames keep the last palette slot free for transparency
+        colors = TRANSPARENT_INDEX if self.delta else 256
+        return img.convert('RGB').convert('P', palette=Image.Palette.ADAPTIVE, colors=colors)
+
+    def block(self, img, offset=(0, 0), **params):
+        """Encode one palette image as a GIF image block"""
+        return b''.join(GifImagePlugin.getdata(
+            img,
+            offset,
+            duration=self.duration,
+            include_color_table=self.palette is None,
+            **params
+        ))
+
+    def frame(self, img):
+        """Graphic control extension, image descriptor and LZW data for one frame"""
+        if not self.delta:
+            return self.block(self.quantize(img))
+        
+        rgb = img.convert('RGB')
+        # With a shared palette the frame is quantized once and compared by index
+        indexed = self.quantize(rgb) if self.palette is not None else None
+        current = rgb if indexed is None else palette_indices(indexed)
+        previous, self.previous = self.previous, current
+        if previous is None:
+            return self.block(self.quantize(rgb) if indexed is None else indexed, disposal=DISPOSAL_KEEP)
+        
+        # Per-pixel change mask: nonzero where the palette index or any channel differs
+        if indexed is None:
+            changed = reduce(ImageChops.lighter, ImageChops.difference(rgb, previous).split())
+        else:
+            changed = ImageChops.difference(current, previous)
+        bbox = changed.getbbox() or (0, 0, 1, 1)
+        changed = changed.crop(bbox)
+        region = self.quantize(rgb.crop(bbox)) if indexed is None else indexed.crop(bbox)
+        if changed.histogram()[0] < MIN_UNCHANGED_SHARE * changed.width * changed.height:
+            # Nearly every pixel moved, as on sequential frames whose hue shifts
+            return self.block(region, bbox[:2], disposal=DISPOSAL_KEEP)
+        region.paste(TRANSPARENT_INDEX, mask=changed.point(UNCHANGED_TABLE))
+        return self.block(
+            region,
+            bbox[:2],
+            disposal=DISPOSAL_KEEP,
+            transparency=TRANSPARENT_INDEX
+        )
+
+    def trailer(self):
+        """GIF trailer byte"""
+        return b';'
+
+def stream_gif(frames, duration, width, height, loop=0, palette=None, delta=False):
+    """Yield GIF bytes chunk by chunk: header, one block per frame, trailer"""
+    writer = StreamingGifWriter(width, height, duration, loop, palette, delta)
+    yield writer.header()
+    for img in frames:
+        with timed_stage('encode'):
+            chunk = writer.frame(img)
+        yield chunk
+    yield writer.trailer()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Production Server Configuration
+Gunicorn settings for prefork serving: gunicorn -c gunicorn_conf.py server:app
+
+The app is imported once in the master, which builds the color tables and
+renders a warm-up frame before forking, so every worker starts with the
+render stack loaded and shares that state copy-on-write.
+"""
+
+import gc
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Worker processes, threads per worker, and requests served before a worker is recycled
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 100))
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+
+preload_app = True
+WARM_UP = os.environ.get('WEB_WARM_UP', 'true').lower() == 'true'
+
+# Workers already cover the cores; a per-worker process pool would oversubscribe them
+if workers > 1:
+    os.environ.setdefault('RENDER_POOL_MODE', 'off')
+
+# Jobs are polled through whichever worker takes the request, and must survive
+# max_requests recycling, so their state is kept on disk rather than per worker
+os.environ.setdefault('JOB_DIR', os.path.join(tempfile.gettempdir(), 'marketing-jobs'))
+
+def when_ready(server):
+    """Master hook, after the preloaded app is imported and before workers fork"""
+    if WARM_UP:
+        from server import warm_up
+        warm_up()
+        server.log.info("Warm-up render complete")
+    # Move everything allocated so far out of the collector's reach, so
+    # collections in the workers don't touch (and copy) the shared pages
+    gc.freeze()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Render Jobs
+Bounded in-process queue that renders GIFs in the background for polling clients
+
+With a JobStore, job records and results are also written to a directory
+shared by every worker process, so a poll may land on any worker and
+finished jobs outlive the worker that rendered them.
+"""
+
+import json
+import os
+import queue
+import re
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+JOB_STATES = ['queued', 'running', 'done', 'failed']
+
+# Identifies the process running a job, so others can tell when it has died
+OWNER = f'{socket.gethostname()}:{os.getpid()}'
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+class Job:
+    """One background render: status, progress and (once done) the GIF bytes"""
+
+    def __init__(self, key, frames_total, render):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.render = render
+        self.status = 'queued'
+        self.frames_total = frames_total
+        self.frames_done = 0
+        self.result = None
+        self.size = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.owner = OWNER
+
+    def to_dict(self):
+        """JSON-serializable status snapshot"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'frames_done': self.frames_done,
+            'frames_total': self.frames_total,
+            'bytes': self.size,
+            'error': self.error,
+            'created': self.created,
+            'finished': self.finished
+        }
+
+    def to_record(self):
+        """Status snapshot plus what another process needs to dedupe and adopt it"""
+        return dict(self.to_dict(), key=self.key, owner=self.owner)
+
+    @classmethod
+    def from_record(cls, record):
+        """Job rebuilt from a stored record; its result stays on disk"""
+        job = cls(record['key'], record['frames_total'], None)
+        job.id = record['id']
+        job.status = record['status']
+        job.frames_done = record['frames_done']
+        job.size = record['bytes']
+        job.error = record['error']
+        job.created = record['created']
+        job.finished = record['finished']
+        job.owner = record['owner']
+        return job
+
+def owner_alive(owner):
+    """False only when owner is a process on this host that no longer exists"""
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        pass
+    return True
+
+class JobStore:
+    """
+    Job records (<id>.json), results (<id>.gif) and key index (key-<key>)
+    in a directory every worker process can read
+    Files are replaced atomically, so readers never see partial writes
+    """
+
+    JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write(self, name, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(name))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _read(self, name):
+        try:
+            with open(self._path(name), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def save(self, job):
+        """Write a job's record and point its key at it"""
+        self._write(job.id + '.json', json.dumps(job.to_record()).encode('utf-8'))
+        self._write('key-' + job.key, job.id.encode('ascii'))
+
+    def save_result(self, job):
+        self._write(job.id + '.gif', job.result)
+
+    def load(self, job_id):
+        """Stored job, or None; a job whose worker died unfinished is marked failed"""
+        if not self.JOB_ID.fullmatch(job_id):
+            return None
+        data = self._read(job_id + '.json')
+        if data is None:
+            return None
+        job = Job.from_record(json.loads(data))
+        if job.finished is None and not owner_alive(job.owner):
+            job.status = 'failed'
+            job.error = 'render worker exited before finishing'
+            job.finished = time.time()
+            self.save(job)
+        return job
+
+    def load_result(self, job_id):
+        return self._read(job_id + '.gif') if self.JOB_ID.fullmatch(job_id) else None
+
+    def find(self, key):
+        """Stored job for a key, or None"""
+        job_id = self._read('key-' + key)
+        return self.load(job_id.decode('ascii')) if job_id else None
+
+    def evict(self, cutoff):
+        """Delete jobs that finished before cutoff, with their results and key index"""
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            job = self.load(name[:-len('.json')])
+            if job is None or job.finished is None or job.finished >= cutoff:
+                continue
+            if self._read('key-' + job.key) == job.id.encode('ascii'):
+                self._unlink('key-' + job.key)
+            self._unlink(job.id + '.gif')
+            self._unlink(job.id + '.json')
+
+    def _unlink(self, name):
+        try:
+            os.unlink(self._path(name))
+        except OSError:
+            pass
+
+class JobQueue:
+    """
+    Fixed pool of render threads fed from a bounded queue
+    Identical jobs (same key) share one entry while queued, running or
+    retained; finished jobs are evicted ttl seconds after completion.
+    With a store, identical jobs are also shared with other processes
+    """
+
+    def __init__(self, workers=2, max_queued=64, ttl=600, store=None):
+        self.workers = workers
+        self.ttl = ttl
+        self.store = store
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        """Start worker threads on first use (lock held)"""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'render-job-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _evict(self, stored=False):
+        """Drop finished jobs older than the TTL, from the store too if stored (lock held)"""
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+        if stored and self.store is not None:
+            self.store.evict(cutoff)
+
+    def _save(self, job):
+        if self.store is not None:
+            self.store.save(job)
+
+    def submit(self, key, frames_total, render):
+        """
+        Queue render (a callable returning GIF chunks, one per frame after the
+        header) unless an identical job exists; returns (job, created)
+        """
+        with self._lock:
+            self._evict(stored=True)
+            existing = self._by_key.get(key)
+            if existing is None and self.store is not None:
+                existing = self.store.find(key)
+            if existing is not None and existing.status != 'failed':
+                return existing, False
+            job = Job(key, frames_total, render)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull(f"job queue full ({self._queue.maxsize} queued)")
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._save(job)
+            self._start()
+        return job, True
+
+    def get(self, job_id):
+        """Job by id (from this process or the store), or None if unknown or expired"""
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+            if job is not None and job.finished is not None and job.finished < time.time() - self.ttl:
+                return None
+        return job
+
+    def result(self, job):
+        """A done job's GIF bytes, or None if they have expired"""
+        if job.result is not None or self.store is None:
+            return job.result
+        return self.store.load_result(job.id)
+
+    def stats(self):
+        """Snapshot of job counts by state"""
+        with self._lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            counts['queue_depth'] = self._queue.qsize()
+            return counts
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            try:
+                self._save(job)
+                parts = []
+                for chunk in job.render():
+                    parts.append(chunk)
+                    job.frames_done = min(max(len(parts) - 1, 0), job.frames_total)
+                    self._save(job)
+                job.result = b''.join(parts)
+                job.size = len(job.result)
+                if self.store is not None:
+                    self.store.save_result(job)
+                job.frames_done = job.frames_total
+                job.status = 'done'
+            except Exception as e:
+                job.error = str(e)
+                job.status = 'failed'
+            finally:
+                job.render = None
+                job.finished = time.time()
+                try:
+                    self._save(job)
+                except OSError:
+                    pass
+                self._queue.task_done()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Render Metrics
+In-process counters and histograms exposed in Prometheus text format
+
+Recording is a dict update under a lock; nothing is formatted until a
+scraper requests /metrics. Set METRICS_ENABLED=false to skip recording
+entirely.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BYTES_BUCKETS = (16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+REGISTRY = []
+
+def escape(value):
+    """Escape a label value for the text exposition format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels) + '}'
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base for registered metrics: name, help text, type and label names"""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        """Yield (name suffix, label pairs, value) for exposition"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', tuple(zip(self.labelnames, key)), value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    """Monotonic counter"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Histogram(Metric):
+    """Cumulative histogram with fixed upper bounds"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in items:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield '_bucket', labels + (('le', format_value(float(bound))),), cumulative
+            yield '_sum', labels, total
+            yield '_count', labels, count
+
+class Collected(Metric):
+    """Metric whose samples are read from a callback at scrape time"""
+
+    def __init__(self, name, documentation, kind, collect, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        for key, value in self.collect():
+            yield '', tuple(zip(self.labelnames, key)), value
+
+def render_metrics():
+    """Every registered metric in Prometheus text format"""
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+# Render pipeline
+STAGE_SECONDS = Histogram(
+    'marketing_render_stage_seconds',
+    'Time spent per render stage (svg, rasterize, decode, raster, composite, palette, encode, resize)',
+    ['stage']
+)
+FRAMES_TOTAL = Counter(
+    'marketing_frames_total',
+    'Frames served, by source (cache, prerendered, rasterized)',
+    ['source']
+)
+OUTPUT_BYTES = Histogram(
+    'marketing_output_bytes',
+    'Size of finished images in bytes',
+    ['format'],
+    buckets=BYTES_BUCKETS
+)
+
+# Requests
+RESPONSES_TOTAL = Counter(
+    'marketing_responses_total',
+    'Image responses by cache outcome (HIT, MISS, COALESCED, BYPASS, NOT_MODIFIED)',
+    ['cache']
+)
+ERRORS_TOTAL = Counter(
+    'marketing_errors_total',
+    'Error responses by endpoint and status code',
+    ['endpoint', 'status']
+)
+
+_local = threading.local()
+
+def record_stage(stage, seconds):
+    """Observe a stage duration, or buffer it when capturing for another process"""
+    samples = getattr(_local, 'samples', None)
+    if samples is not None:
+        samples.append((stage, seconds))
+    else:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+@contextmanager
+def timed_stage(stage):
+    """Time the enclosed block as one observation of stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+@contextmanager
+def capture_stages():
+    """
+    Buffer stage timings recorded on this thread instead of observing them
+    Used by process workers, whose registry is not scraped, to ship
+    timings back to the parent
+    """
+    _local.samples = samples = []
+    try:
+        yield samples
+    finally:
+        _local.samples = None
+
+def replay_stages(samples):
+    """Observe stage timings captured in a worker"""
+    for stage, seconds in samples:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+def count_output(chunks, fmt):
+    """Pass chunks through, observing the total size once the stream completes"""
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        yield chunk
+    OUTPUT_BYTES.observe(size, format=fmt)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+GIF Palettes
+Builds a single shared palette for a request from its known frame colors
+"""
+
+from PIL import Image
+
+from generate_marketing import resolve_frame_colors
+
+# Opacities the frame design draws accent and text colors with (geometry,
+# corners, energy circles, tagline/URL) plus glow falloff steps
+ACCENT_ALPHAS = (0.1, 0.2, 0.4, 0.5, 0.6, 0.7, 1.0)
+TEXT_ALPHAS = (0.25, 0.5, 0.8, 0.9, 1.0)
+RAMP_STEPS = 16
+RAMP_WEIGHT = 4
+
+def hex_to_rgb(color):
+    """Parse a #rrggbb color, returning None for anything else"""
+    if not color or not color.startswith('#') or len(color) != 7:
+        return None
+    try:
+        return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+    except ValueError:
+        return None
+
+def mix(base, over, alpha):
+    """Composite color over base at the given opacity"""
+    return tuple(round(b + (o - b) * alpha) for b, o in zip(base, over))
+
+def frame_palette_colors(frame_index, options):
+    """Candidate colors for one frame: gradient ramp plus accent/text blends over it"""
+    _, brightness, colors = resolve_frame_colors(frame_index, options)
+    stops = [rgb for rgb in (hex_to_rgb(c) for _, c in colors['stops']) if rgb]
+    ramp = []
+    for start, end in zip(stops, stops[1:]):
+        ramp.extend(mix(start, end, i / RAMP_STEPS) for i in range(RAMP_STEPS))
+    ramp.extend(stops[-1:])
+
+    candidates = ramp * RAMP_WEIGHT
+    for color, alphas in ((colors['accent'], ACCENT_ALPHAS + (brightness,)), (colors['text'], TEXT_ALPHAS)):
+        rgb = hex_to_rgb(color)
+        if rgb is None:
+            continue
+        for base in ramp[::2]:
+            candidates.extend(mix(base, rgb, alpha) for alpha in alphas)
+    return candidates
+
+def global_candidates(frame_indices, options):
+    """Candidate colors for every frame of a request, plus black and white"""
+    candidates = [(0, 0, 0), (255, 255, 255)]
+    for frame_id in dict.fromkeys(frame_indices):
+        candidates.extend(frame_palette_colors(frame_id, options))
+    return candidates
+
+def quantize_colors(candidates, colors):
+    """Median-cut palette image over a list of RGB colors"""
+    strip = Image.new('RGB', (len(candidates), 1))
+    strip.putdata(candidates)
+    return strip.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
+
+def build_global_palette(frame_indices, options, colors=256):
+    """
+    Build one palette image covering every frame of a request
+    Computed from options alone, so it is ready before any frame renders
+    """
+    return quantize_colors(global_candidates(frame_indices, options), colors)
+
+def adaptive_palette(img, frame_indices, options, colors=256):
+    """
+    Palette learned from the first rendered frame's actual pixels, combined
+    with every frame's candidate colors so later frames (whose hue moves on
+    each step) are still covered
+    The frame is sampled down to about one frame's share of the candidates
+    """
+    candidates = global_candidates(frame_indices, options)
+    share = len(candidates) // max(len(set(frame_indices)), 1)
+    scale = max(1, round((img.width * img.height / max(share, 1)) ** 0.5))
+    sample = img.convert('RGB').reduce(scale)
+    return quantize_colors(candidates + list(sample.getdata()), colors)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Bulk Pre-Renderer
+Renders frame ranges to disk across all cores, with a resumable manifest
+
+Usage:
+    python prerender.py 0-9999 --out store/ --format png --company Brand
+    python prerender.py 100,200,300 --out store/ --format svg --font tech
+
+The manifest (manifest.json) maps frame id -> file, size and render time and
+records the options used. Re-running with the same output directory skips
+frames already in the manifest. Point PRERENDER_DIR at a PNG store and the
+server serves matching frames from it instead of rasterizing.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cache import canonical_key
+from generate_marketing import FRAME_SPACE, frame_cache_key
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+OUTPUT_FORMATS = ['svg', 'png', 'gif']
+PROGRESS_INTERVAL = 0.5  # seconds between progress lines
+
+# Options that affect frame pixels; palette/encoding only matter for GIF assembly
+STORE_OPTION_KEYS = (
+    'company', 'services', 'tagline', 'url', 'bg_color', 'text_color',
+    'accent_color', 'font', 'geometry', 'width', 'renderer'
+)
+
+def parse_frame_spec(spec, limit=None):
+    """
+    Parse '0-999', '5,9,12' or a mix like '0-9,100-109' into frame ids
+    With limit, specs listing more ids than that (repeats included) are
+    rejected before any range is expanded
+    """
+    ranges = []
+    total = 0
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(p) for p in part.split('-', 1))
+            if end < start:
+                raise ValueError(f"invalid frame range '{part}'")
+        else:
+            start = end = int(part)
+        for frame_id in (start, end):
+            if not 0 <= frame_id < FRAME_SPACE:
+                raise ValueError(f"frame id {frame_id} outside 0-{FRAME_SPACE - 1}")
+        total += end - start + 1
+        if limit is not None and total > limit:
+            raise ValueError(f"frame spec lists more than {limit} frames")
+        ranges.append((start, end))
+    frame_ids = []
+    for start, end in ranges:
+        frame_ids.extend(range(start, end + 1))
+    return list(dict.fromkeys(frame_ids))
+
+def store_options(options):
+    """The subset of options recorded in (and matched against) a store"""
+    return {key: options.get(key) for key in STORE_OPTION_KEYS}
+
+def load_manifest(path):
+    """Read a manifest, returning None when it does not exist"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def write_manifest(path, manifest):
+    """Atomically replace the manifest so an interrupted run leaves a valid checkpoint"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def render_to_file(frame_id, options, fmt, out_dir, duration):
+    """Worker task: render one frame to disk, returning its manifest entry"""
+    from io import BytesIO
+
+    from generate_marketing import generate_marketing_svg_bytes
+    from render import DEFAULT_RENDERER, encode_gif, rasterize_frame, rasterize_png
+
+    start = time.perf_counter()
+    if fmt == 'svg':
+        data = generate_marketing_svg_bytes(frame_id, options)
+    elif fmt == 'png' and (options.get('renderer') or DEFAULT_RENDERER) == 'cairosvg':
+        # cairosvg's own PNG is written as is
+        data = rasterize_png(frame_id, options)
+    elif fmt == 'png':
+        output = BytesIO()
+        rasterize_frame(frame_id, options).save(output, 'PNG')
+        data = output.getvalue()
+    else:
+        data = encode_gif([rasterize_frame(frame_id, options)], duration)
+    render_ms = (time.perf_counter() - start) * 1000
+
+    name = f"{frame_id}.{fmt}"
+    with open(os.path.join(out_dir, name), 'wb') as f:
+        f.write(data)
+    return frame_id, {'file': name, 'bytes': len(data), 'render_ms': round(render_ms, 2)}
+
+def report_progress(done, total, started, skipped):
+    """Single-line progress report on stderr"""
+    elapsed = time.perf_counter() - started
+    rate = (done - skipped) / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate else 0.0
+    sys.stderr.write(f"\r[{done}/{total}] {rate:.1f} frames/s, ETA {eta:.0f}s ")
+    sys.stderr.flush()
+
+def prerender(frame_ids, options, fmt, out_dir, duration=1000, jobs=None, checkpoint_every=100):
+    """Render frames to out_dir in parallel, resuming from an existing manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    recorded = store_options(options)
+    options_key = canonical_key(recorded, fmt)
+
+    manifest = load_manifest(manifest_path)
+    if manifest is None:
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'format': fmt,
+            'options': recorded,
+            'options_key': options_key,
+            'frames': {}
+        }
+    elif manifest.get('options_key') != options_key:
+        raise ValueError(f"{manifest_path} was rendered with different options or format; use another directory")
+
+    frames = manifest['frames']
+    pending = [
+        frame_id for frame_id in frame_ids
+        if str(frame_id) not in frames
+        or not os.path.exists(os.path.join(out_dir, frames[str(frame_id)]['file']))
+    ]
+    skipped = len(frame_ids) - len(pending)
+    started = last_report = time.perf_counter()
+    done = skipped
+
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(render_to_file, frame_id, options, fmt, out_dir, duration)
+            for frame_id in pending
+        ]
+        try:
+            for future in as_completed(futures):
+                frame_id, entry = future.result()
+                frames[str(frame_id)] = entry
+                done += 1
+                if done % checkpoint_every == 0:
+                    write_manifest(manifest_path, manifest)
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL or done == len(frame_ids):
+                    report_progress(done, len(frame_ids), started, skipped)
+                    last_report = now
+        finally:
+            for future in futures:
+                future.cancel()
+            write_manifest(manifest_path, manifest)
+
+    sys.stderr.write('\n')
+    return manifest
+
+class PrerenderedStore:
+    """Read-only view of a PNG store produced by prerender()"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        manifest = load_manifest(os.path.join(directory, MANIFEST_NAME)) or {}
+        self.options = manifest.get('options', {})
+        self.frames = manifest.get('frames', {}) if manifest.get('format') == 'png' else {}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def load(self, frame_id, options):
+        """Decoded frame if the store holds it with identical pixels, else None"""
+        from PIL import Image
+
+        entry = self.frames.get(str(frame_id))
+        if entry is None or frame_cache_key(frame_id, options) != frame_cache_key(frame_id, self.options):
+            return None
+        try:
+            img = Image.open(os.path.join(self.directory, entry['file']))
+            img.load()
+        except OSError:
+            return None
+        return img
+
+def main():
+    from request_options import parse_render_options
+
+    parser = argparse.ArgumentParser(description='Pre-render marketing frames to disk')
+    parser.add_argument('frames', help="frame ids: '0-9999', '1,2,3' or '0-9,100-109'")
+    parser.add_argument('--out', required=True, help='output directory (also the checkpoint location)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='png')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--duration', type=int, default=1000, help='frame duration for GIF output')
+    # Same text and visual parameters as /marketing.gif
+    for name in (
+        'company', 'services', 'tagline', 'url', 'bg', 'text', 'accent', 'font', 'geometry', 'width', 'scale',
+        'renderer'
+    ):
+        parser.add_argument(f'--{name}')
+    args = parser.parse_args()
+
+    try:
+        frame_ids = parse_frame_spec(args.frames)
+        params = {key: value for key, value in vars(args).items() if value is not None}
+        options = parse_render_options(params, len(frame_ids))
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        manifest = prerender(frame_ids, options, args.format, args.out, args.duration, args.jobs)
+    except ValueError as e:
+        parser.error(str(e))
+    total_bytes = sum(entry['bytes'] for entry in manifest['frames'].values())
+    print(f"{len(manifest['frames'])} frames in {args.out} ({total_bytes / 1024 / 1024:.1f} MB)")
+
+if __name__ == '__main__':
+    main()
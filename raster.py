@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Direct Raster Renderer
+Draws marketing frames straight to a Pillow image, skipping SVG serialization,
+cairosvg parsing and the PNG round trip
+
+Reproduces the layout of generate_marketing_svg: shapes are drawn as
+supersampled coverage masks and painted with their group's color and opacity,
+and the glow filters become Gaussian blurs of the text mask. Font files are
+looked up by name (RASTER_FONT_DIR first, then the system font paths), so
+glyphs match the SVG output only as closely as the installed fonts do.
+
+Coordinates are in the SVG's 400x480 user space; a scale factor maps them to
+the output size, so wider frames are drawn at full resolution rather than
+upscaled.
+"""
+
+import math
+import os
+from functools import lru_cache
+
+from PIL import Image, ImageChops, ImageColor, ImageDraw, ImageFilter, ImageFont
+
+from cache import LRUCache, memoize
+from generate_marketing import DEFAULT_COMPANY, DEFAULT_SERVICES, FONT_STYLES, resolve_frame_colors
+
+FRAME_WIDTH = 400
+FRAME_HEIGHT = 480
+SUPERSAMPLE = 2
+BEZIER_STEPS = 24
+
+FONT_DIR = os.environ.get('RASTER_FONT_DIR')
+
+# Blur each distinct glowing text once and reuse the sprite across frames
+GLOW_SPRITES = os.environ.get('GLOW_SPRITES', 'true').lower() == 'true'
+
+def mask_nbytes(value):
+    """Size of a cached mask, or of a (mask, offset) glow sprite"""
+    img = value[0] if isinstance(value, tuple) else value
+    return len(img.getbands()) * img.width * img.height
+
+# Shape masks, gradient fields and glow sprites, bounded by RASTER_CACHE_MAX_BYTES
+# per process: at large widths each one is megabytes
+raster_cache = LRUCache(
+    max_bytes=int(os.environ.get('RASTER_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    sizeof=mask_nbytes
+)
+
+# Candidate font files per style, closest match to the SVG font-family first
+FONT_FILES = {
+    'bold': ['ariblk.ttf', 'Arial Black.ttf', 'DejaVuSans-Bold.ttf', 'LiberationSans-Bold.ttf'],
+    'tech': ['courbd.ttf', 'Courier New Bold.ttf', 'DejaVuSansMono-Bold.ttf', 'LiberationMono-Bold.ttf'],
+    'elegant': ['georgia.ttf', 'Georgia.ttf', 'DejaVuSerif.ttf', 'LiberationSerif-Regular.ttf'],
+    'blocky': ['impact.ttf', 'Impact.ttf', 'DejaVuSans-Bold.ttf', 'LiberationSans-Bold.ttf'],
+    'script': ['BRUSHSCI.TTF', 'Brush Script.ttf', 'DejaVuSerif-Italic.ttf', 'LiberationSerif-Italic.ttf'],
+    'arial': ['arial.ttf', 'Arial.ttf', 'DejaVuSans.ttf', 'LiberationSans-Regular.ttf']
+}
+
+# Shape tables mirroring create_geometry_pattern and the fixed frame chrome.
+# Must stay in step with generate_marketing_svg. Shapes are
+# (kind, coordinates, stroke width): 'line' and 'polyline' take points,
+# 'rect' x, y, w, h, 'circle' cx, cy, r (outline), 'disc' cx, cy, r (filled)
+# and 'quad' a quadratic Bezier's start, control and end points
+GEOMETRY_SHAPES = {
+    'sharp': (0.6, (
+        ('line', (50, 50, 150, 50), 2),
+        ('line', (150, 50, 150, 150), 2),
+        ('line', (250, 100, 350, 100), 2),
+        ('line', (350, 100, 350, 200), 2),
+        ('rect', (50, 350, 50, 50), 2)
+    )),
+    'round': (0.6, (
+        ('circle', (100, 100, 30), 2),
+        ('circle', (300, 150, 40), 2),
+        ('quad', (50, 300, 100, 250, 150, 300), 2),
+        ('quad', (250, 350, 300, 300, 350, 350), 2)
+    )),
+    'minimal': (0.4, (
+        ('line', (50, 240, 350, 240), 1),
+        ('circle', (200, 240, 100), 1)
+    ))
+}
+MIXED_SHAPES = (
+    (0.5, (
+        ('polyline', (50, 100, 150, 100, 150, 200), 2),
+        ('circle', (300, 150, 30), 2),
+        ('rect', (250, 350, 40, 40), 2)
+    )),
+    (0.5, (
+        ('line', (0, 0, 200, 200), 2),
+        ('circle', (100, 380, 25), 2),
+        ('quad', (250, 50, 300, 100, 350, 50), 2)
+    )),
+    (0.5, (
+        ('rect', (50, 50, 60, 60), 2),
+        ('quad', (250, 400, 300, 350, 350, 400), 2),
+        ('line', (200, 100, 200, 180), 2)
+    ))
+)
+CORNER_SHAPES = (
+    ('polyline', (20, 20, 60, 20, 60, 60), 2),
+    ('polyline', (380, 20, 340, 20, 340, 60), 2),
+    ('polyline', (20, 460, 60, 460, 60, 420), 2),
+    ('polyline', (380, 460, 340, 460, 340, 420), 2)
+)
+SEPARATOR_SHAPES = (('line', (80, 200, 320, 200), 2),)
+PULSE_INNER_SHAPES = (('circle', (200, 240, 120), 1),)
+PULSE_OUTER_SHAPES = (('circle', (200, 240, 140), 1),)
+DOT_SHAPES = (
+    ('disc', (200, 360, 3), 0),
+    ('disc', (180, 360, 2), 0),
+    ('disc', (220, 360, 2), 0)
+)
+
+def scaled_size(scale):
+    """Frame (width, height) in pixels at a scale of the 400x480 layout"""
+    return round(FRAME_WIDTH * scale), round(FRAME_HEIGHT * scale)
+
+def geometry_shapes(geometry, index):
+    """(opacity, shapes) for a frame's geometry pattern"""
+    if geometry in GEOMETRY_SHAPES:
+        return GEOMETRY_SHAPES[geometry]
+    return MIXED_SHAPES[index % 3]
+
+@lru_cache(maxsize=64)
+def load_font(style, size):
+    """Font for a style at a pixel size, falling back to Pillow's bundled font"""
+    for name in FONT_FILES.get(style, FONT_FILES['arial']):
+        candidates = [os.path.join(FONT_DIR, name)] if FONT_DIR else []
+        candidates.append(name)
+        for candidate in candidates:
+            try:
+                return ImageFont.truetype(candidate, size)
+            except OSError:
+                continue
+    return ImageFont.load_default(size)
+
+def to_rgb(color):
+    """Parse an SVG color string, treating anything unparseable as black"""
+    try:
+        return ImageColor.getrgb(color)[:3]
+    except (ValueError, AttributeError):
+        return (0, 0, 0)
+
+@lru_cache(maxsize=1024)
+def opacity_table(opacity):
+    """Point table scaling mask coverage by an opacity"""
+    opacity = max(0.0, min(1.0, opacity))
+    return [round(v * opacity) for v in range(256)]
+
+def _bezier(x0, y0, cx, cy, x1, y1):
+    points = []
+    for step in range(BEZIER_STEPS + 1):
+        t = step / BEZIER_STEPS
+        a, b, c = (1 - t) ** 2, 2 * (1 - t) * t, t ** 2
+        points.extend((a * x0 + b * cx + c * x1, a * y0 + b * cy + c * y1))
+    return points
+
+def draw_shapes(draw, shapes, scale):
+    """Draw shapes in full coverage onto a supersampled 'L' mask"""
+    for kind, coords, width in shapes:
+        w = max(1, round(width * scale))
+        half = width / 2
+        if kind == 'line':
+            draw.line([v * scale for v in coords], fill=255, width=w)
+        elif kind == 'polyline':
+            draw.line([v * scale for v in coords], fill=255, width=w, joint='curve')
+        elif kind == 'quad':
+            draw.line([v * scale for v in _bezier(*coords)], fill=255, width=w, joint='curve')
+        elif kind == 'rect':
+            x, y, rw, rh = coords
+            box = (x - half, y - half, x + rw + half, y + rh + half)
+            draw.rectangle([v * scale for v in box], outline=255, width=w)
+        elif kind == 'circle':
+            cx, cy, r = coords
+            box = (cx - r - half, cy - r - half, cx + r + half, cy + r + half)
+            draw.ellipse([v * scale for v in box], outline=255, width=w)
+        elif kind == 'disc':
+            cx, cy, r = coords
+            draw.ellipse([v * scale for v in (cx - r, cy - r, cx + r, cy + r)], fill=255)
+
+def supersampled_mask(scale):
+    """Blank 'L' mask at SUPERSAMPLE times the frame size"""
+    width, height = scaled_size(scale)
+    return Image.new('L', (width * SUPERSAMPLE, height * SUPERSAMPLE))
+
+@memoize(raster_cache)
+def shape_mask(shapes, scale=1):
+    """Antialiased coverage mask of shapes at frame size (shapes never vary, so cached)"""
+    mask = supersampled_mask(scale)
+    draw_shapes(ImageDraw.Draw(mask), shapes, SUPERSAMPLE * scale)
+    return mask.reduce(SUPERSAMPLE)
+
+def text_mask(text, style, size, spacing, y, scale=1):
+    """
+    Coverage mask of one centered line of text with its baseline at y
+    Letter spacing is applied per glyph, as SVG letter-spacing does
+    """
+    text = ' '.join(text.split())
+    mask = supersampled_mask(scale)
+    draw = ImageDraw.Draw(mask)
+    pixels = SUPERSAMPLE * scale
+    font = load_font(style, round(size * pixels))
+    center, baseline = mask.width / 2, y * pixels
+    if not spacing:
+        draw.text((center, baseline), text, fill=255, font=font, anchor='ms')
+    else:
+        gap = spacing * pixels
+        advances = [font.getlength(ch) for ch in text]
+        x = center - (sum(advances) + gap * (len(text) - 1)) / 2
+        for ch, advance in zip(text, advances):
+            draw.text((x, baseline), ch, fill=255, font=font, anchor='ls')
+            x += advance + gap
+    return mask.reduce(SUPERSAMPLE)
+
+def paint(base, color, mask, opacity=1.0, offset=(0, 0)):
+    """Composite a solid color through a coverage mask (placed at offset) at an opacity"""
+    box = mask.getbbox()
+    if box is None:
+        return
+    mask = mask.crop(box)
+    if opacity < 1.0:
+        mask = mask.point(opacity_table(round(opacity, 4)))
+    base.paste(color, (box[0] + offset[0], box[1] + offset[1]), mask)
+
+def glow_box(mask, blur):
+    """The mask's bounding box padded by the blur's reach, or None if empty"""
+    box = mask.getbbox()
+    if box is None:
+        return None
+    # The kernel is negligible past 3 sigma
+    pad = math.ceil(3 * blur)
+    return (
+        max(0, box[0] - pad), max(0, box[1] - pad),
+        min(mask.width, box[2] + pad), min(mask.height, box[3] + pad)
+    )
+
+@memoize(raster_cache)
+def glow_sprite(text, style, size, spacing, y, blur, scale=1):
+    """
+    Coverage of glowing text, cropped to its glow: the blurred mask screened
+    with the sharp one. Color is applied when pasting, so one sprite serves
+    every hue. Returns (mask, offset), or None for blank text
+    """
+    mask = text_mask(text, style, size, spacing, y, scale)
+    blur *= scale
+    box = glow_box(mask, blur)
+    if box is None:
+        return None
+    mask = mask.crop(box)
+    # Pillow's GaussianBlur is a separable box-blur approximation
+    return ImageChops.screen(mask.filter(ImageFilter.GaussianBlur(blur)), mask), box[:2]
+
+def paint_glow_text(base, color, text, style, size, spacing, y, blur, scale=1):
+    """Glowing text from the sprite cache, or blurred per call with GLOW_SPRITES=false"""
+    if not GLOW_SPRITES:
+        paint_glow(base, color, text_mask(text, style, size, spacing, y, scale), blur * scale)
+        return
+    sprite = glow_sprite(' '.join(text.split()), style, size, spacing, y, blur, scale)
+    if sprite is not None:
+        base.paste(color, sprite[1], sprite[0])
+
+def paint_glow(base, color, mask, blur):
+    """feGaussianBlur + feMerge: the blurred text under the sharp text"""
+    # Blur only the text's neighbourhood
+    box = glow_box(mask, blur)
+    if box is None:
+        return
+    paint(base, color, mask.crop(box).filter(ImageFilter.GaussianBlur(blur)), offset=box[:2])
+    paint(base, color, mask)
+
+@memoize(raster_cache)
+def gradient_field(bg_style, size=(FRAME_WIDTH, FRAME_HEIGHT)):
+    """
+    Gradient parameter (0-255) per pixel for a background style, in the SVG
+    objectBoundingBox space of the background rect at size
+    """
+    vertical = Image.linear_gradient('L').resize(size, Image.Resampling.BILINEAR)
+    if bg_style == 'horizontal':
+        ramp = Image.linear_gradient('L').transpose(Image.Transpose.TRANSPOSE)
+        return ramp.resize(size, Image.Resampling.BILINEAR)
+    if bg_style == 'diagonal':
+        horizontal = gradient_field('horizontal', size)
+        return ImageChops.add(vertical, horizontal, scale=2.0)
+    if bg_style == 'radial':
+        # radial_gradient reaches 181 at the inscribed circle (128 * sqrt 2)
+        radial = Image.radial_gradient('L').resize(size, Image.Resampling.BILINEAR)
+        return radial.point([min(255, round(v * 255 / 181)) for v in range(256)])
+    return vertical
+
+@lru_cache(maxsize=4096)
+def gradient_lut(stops):
+    """256-entry RGB palette interpolating (offset percent, color) stops"""
+    stops = [(offset / 100, to_rgb(color)) for offset, color in stops]
+    lut = []
+    for i in range(256):
+        t = i / 255
+        lower = stops[0]
+        upper = stops[-1]
+        for stop in stops:
+            if stop[0] <= t:
+                lower = stop
+            if stop[0] >= t:
+                upper = stop
+                break
+        span = upper[0] - lower[0]
+        f = (t - lower[0]) / span if span else 0.0
+        lut.extend(round(a + (b - a) * f) for a, b in zip(lower[1], upper[1]))
+    return lut
+
+def render_background(bg_style, stops, scale=1):
+    """Background gradient as an RGB image"""
+    field = gradient_field(bg_style, scaled_size(scale)).copy()
+    field.putpalette(gradient_lut(stops))
+    return field.convert('RGB')
+
+def frame_scale(options):
+    """Scale of the 400x480 layout for the request's output width"""
+    return (options.get('width') or FRAME_WIDTH) / FRAME_WIDTH
+
+def render_frame(frame_index, options):
+    """Render one frame as an RGB image at the output width, without going through SVG"""
+    company = options.get('company', DEFAULT_COMPANY)
+    services = options.get('services', DEFAULT_SERVICES)
+    tagline = options.get('tagline')
+    url = options.get('url')
+
+    components, brightness, colors = resolve_frame_colors(frame_index, options)
+    accent = to_rgb(colors['accent'])
+    text_color = to_rgb(colors['text'])
+    font = components['font']
+    spacing = float(FONT_STYLES[font]['spacing'].rstrip('px') or 0)
+
+    service_text = services[frame_index % len(services)]
+    company_size = 36 if len(company) <= 20 else 28
+    service_size = 28 if len(service_text) <= 30 else 22
+    scale = frame_scale(options)
+
+    # Background and geometry
+    frame = render_background(components['bg_style'], colors['stops'], scale)
+    opacity, shapes = geometry_shapes(components['geometry'], frame_index)
+    paint(frame, accent, shape_mask(shapes, scale), opacity)
+    paint(frame, accent, shape_mask(CORNER_SHAPES, scale), 0.7)
+
+    # Text with glows
+    paint_glow_text(frame, text_color, company, font, company_size, spacing, 180, 8, scale)
+    paint(frame, accent, shape_mask(SEPARATOR_SHAPES, scale), brightness)
+    paint_glow_text(frame, accent, service_text, font, service_size, spacing, 250, 4, scale)
+    if tagline:
+        paint(frame, text_color, text_mask(tagline, 'arial', 18, 0, 300, scale), 0.9)
+    if url:
+        paint(frame, text_color, text_mask(url, 'arial', 14, 0, 330 if tagline else 300, scale), 0.8)
+
+    # Energy pulse and status dots
+    paint(frame, accent, shape_mask(PULSE_INNER_SHAPES, scale), brightness * 0.2)
+    paint(frame, accent, shape_mask(PULSE_OUTER_SHAPES, scale), brightness * 0.1)
+    paint(frame, accent, shape_mask(DOT_SHAPES, scale), brightness)
+    return frame
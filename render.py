@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Frame Renderer
+Rasterizes marketing frames (with a shared frame cache) and encodes GIFs
+"""
+
+import os
+import sys
+from collections import Counter
+from io import BytesIO
+from itertools import chain
+
+try:
+    import cairosvg
+    from cairosvg.parser import Tree
+    from cairosvg.surface import PNGSurface
+    HAS_CAIRO = True
+except (ImportError, OSError):  # OSError: cairosvg installed but libcairo missing
+    HAS_CAIRO = False
+
+try:
+    from PIL import Image
+    from gif_stream import stream_gif
+    from palette import adaptive_palette, build_global_palette
+    import raster
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+try:
+    import compositor
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from generate_marketing import generate_marketing_svg_bytes, frame_cache_key
+from cache import LRUCache
+from metrics import FRAMES_TOTAL, timed_stage
+from prerender import PrerenderedStore
+from render_pool import imap_frames
+
+FRAME_WIDTH = 400
+FRAME_HEIGHT = 480
+MIN_WIDTH = 40
+MAX_WIDTH = 1600
+PALETTE_MODES = ['per-frame', 'global', 'adaptive']
+ENCODING_MODES = ['full', 'delta']
+
+# cairosvg rasterizes the generated SVG; raster draws the frame directly with Pillow;
+# layered composites cached per-layer rasters with NumPy
+RENDERERS = ['cairosvg', 'raster', 'layered']
+DEFAULT_RENDERER = os.environ.get('RENDERER', 'cairosvg')
+
+def image_nbytes(img):
+    """Approximate decoded size of a PIL image in bytes"""
+    return len(img.getbands()) * img.width * img.height
+
+# Decoded frames shared across GIF compositions, bounded by FRAME_CACHE_MAX_BYTES
+frame_cache = LRUCache(
+    max_bytes=int(os.environ.get('FRAME_CACHE_MAX_BYTES', 128 * 1024 * 1024)),
+    sizeof=image_nbytes
+)
+
+# Animated output formats and their content types (APNG is served as PNG)
+IMAGE_FORMATS = {'gif': 'image/gif', 'webp': 'image/webp', 'apng': 'image/png'}
+
+# Frames narrower than this are downsampled from one render at this width,
+# so every thumbnail size of a frame shares a single rasterization
+VARIANT_BASE_WIDTH = int(os.environ.get('VARIANT_BASE_WIDTH', FRAME_WIDTH))
+
+# cairo ARGB32 is native-endian premultiplied alpha, which Pillow unpacks as
+# 'BGRa' on little-endian hosts. It has no raw mode for the big-endian layout,
+# so those hosts always take the PNG path
+RAW_SURFACE_SUPPORTED = sys.byteorder == 'little'
+
+# Render cairosvg frames onto an image surface and read its pixels directly
+# instead of encoding and decoding a PNG (RAW_SURFACE=false restores the PNG path)
+RAW_SURFACE = RAW_SURFACE_SUPPORTED and os.environ.get('RAW_SURFACE', 'true').lower() == 'true'
+
+# PNG frames pre-rendered by prerender.py, consulted on frame cache misses
+prerendered = PrerenderedStore(os.environ['PRERENDER_DIR']) if os.environ.get('PRERENDER_DIR') else None
+
+def frame_size(options):
+    """Output (width, height) for a request, keeping the 400x480 aspect ratio"""
+    width = options.get('width') or FRAME_WIDTH
+    return width, round(width * FRAME_HEIGHT / FRAME_WIDTH)
+
+def downscale(img, size):
+    """Derive a smaller variant of a frame (box-reduce, then Lanczos for the remainder)"""
+    with timed_stage('resize'):
+        return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+def require_cairo():
+    """Fail with a clear message when the cairosvg renderer is used without cairosvg or libcairo"""
+    if not HAS_CAIRO:
+        raise RuntimeError("The cairosvg renderer needs cairosvg and libcairo; use renderer=raster or RENDERER=raster")
+
+def rasterize_png(frame_id, options):
+    """Generate a frame's SVG and rasterize it to PNG bytes"""
+    require_cairo()
+    width, height = frame_size(options)
+    with timed_stage('svg'):
+        svg = generate_marketing_svg_bytes(frame_id, options)
+    with timed_stage('rasterize'):
+        return cairosvg.svg2png(
+            bytestring=svg,
+            output_width=width,
+            output_height=height
+        )
+
+def rasterize_surface(frame_id, options):
+    """
+    Generate a frame's SVG and rasterize it onto a cairo image surface,
+    wrapping the surface pixels as a PIL image without a PNG round trip
+    Pillow unpacks the premultiplied buffer in one pass (no zlib either way).
+    Little-endian hosts only (RAW_SURFACE_SUPPORTED)
+    """
+    require_cairo()
+    width, height = frame_size(options)
+    with timed_stage('svg'):
+        svg = generate_marketing_svg_bytes(frame_id, options)
+    with timed_stage('rasterize'):
+        surface = PNGSurface(Tree(bytestring=svg), None, 96, output_width=width, output_height=height)
+        image_surface = surface.cairo
+        image_surface.flush()
+    with timed_stage('decode'):
+        img = Image.frombuffer(
+            'RGBA', (width, height), image_surface.get_data(),
+            'raw', 'BGRa', image_surface.get_stride(), 1
+        )
+        img.load()
+    surface.finish()
+    return img
+
+def rasterize_frame(frame_id, options):
+    """Render a frame to a decoded PIL image with the requested renderer (default RENDERER)"""
+    renderer = options.get('renderer') or DEFAULT_RENDERER
+    if renderer in ('raster', 'layered'):
+        if renderer == 'layered':
+            with timed_stage('composite'):
+                img = compositor.render_frame(frame_id, options)
+        else:
+            with timed_stage('raster'):
+                img = raster.render_frame(frame_id, options)
+        # Both draw at the output width, like cairosvg's output_width
+        return img
+    if RAW_SURFACE:
+        return rasterize_surface(frame_id, options)
+    png = rasterize_png(frame_id, options)
+    with timed_stage('decode'):
+        img = Image.open(BytesIO(png))
+        img.load()
+    return img
+
+def iter_frames(frame_indices, options):
+    """Yield frames in order as they become available, rasterizing only cache misses"""
+    frames = {}
+    missing = []
+    for frame_id in dict.fromkeys(frame_indices):
+        key = frame_cache_key(frame_id, options)
+        img = frame_cache.get(key)
+        if img is not None:
+            FRAMES_TOTAL.inc(source='cache')
+        elif prerendered is not None:
+            img = prerendered.load(frame_id, options)
+            if img is not None:
+                FRAMES_TOTAL.inc(source='prerendered')
+                frame_cache.put(key, img)
+        if img is None:
+            missing.append(frame_id)
+        else:
+            frames[frame_id] = img
+    
+    # Misses arrive in order of first occurrence, so each is pulled exactly when needed
+    size = frame_size(options)
+    if size[0] < VARIANT_BASE_WIDTH:
+        # Thumbnails come from the base-width frames, themselves cached and shared
+        base = iter_frames(missing, dict(options, width=VARIANT_BASE_WIDTH))
+        rendered, source = (downscale(img, size) for img in base), 'downscaled'
+    else:
+        rendered, source = imap_frames(missing, options), 'rasterized'
+    remaining = Counter(frame_indices)
+    for frame_id in frame_indices:
+        img = frames.get(frame_id)
+        if img is None:
+            img = next(rendered)
+            FRAMES_TOTAL.inc(source=source)
+            frame_cache.put(frame_cache_key(frame_id, options), img)
+            frames[frame_id] = img
+        remaining[frame_id] -= 1
+        if not remaining[frame_id]:
+            del frames[frame_id]
+        yield img
+
+def render_frames(frame_indices, options):
+    """Render frames in order, rasterizing only frame cache misses"""
+    return list(iter_frames(frame_indices, options))
+
+def gif_palette(first_frame, frame_indices, options):
+    """Shared palette for the request's palette mode (None for per-frame palettes)"""
+    mode = options.get('palette', 'per-frame')
+    # Delta encoding needs a free palette slot for transparency
+    colors = 255 if options.get('encoding') == 'delta' else 256
+    if mode not in ('global', 'adaptive'):
+        return None
+    with timed_stage('palette'):
+        if mode == 'global':
+            return build_global_palette(frame_indices, options, colors)
+        return adaptive_palette(first_frame, frame_indices, options, colors)
+
+def encode_gif(frames, duration, palette=None, delta=False):
+    """Encode PIL frames into animated GIF bytes"""
+    frames = iter(frames)
+    first = next(frames)
+    return b''.join(stream_gif(
+        chain([first], frames), duration, first.width, first.height,
+        palette=palette, delta=delta
+    ))
+
+def encode_animation(frames, duration, fmt, lossless=False, quality=80, effort=4):
+    """
+    Encode PIL frames as animated WebP or APNG bytes
+    effort is the WebP method (0-6); for APNG it maps onto zlib levels 0-9
+    """
+    frames = [img.convert('RGB') for img in frames]
+    output = BytesIO()
+    with timed_stage('encode'):
+        if fmt == 'webp':
+            frames[0].save(
+                output, 'WEBP', save_all=True, append_images=frames[1:],
+                duration=duration, loop=0, lossless=lossless, quality=quality, method=effort
+            )
+        else:
+            frames[0].save(
+                output, 'PNG', save_all=True, append_images=frames[1:],
+                duration=duration, loop=0, compress_level=round(effort * 9 / 6)
+            )
+    return output.getvalue()
+
+def render_gif(frame_indices, options, duration):
+    """Render frames and encode them into GIF bytes"""
+    return b''.join(stream_rendered_gif(frame_indices, options, duration))
+
+def stream_rendered_gif(frame_indices, options, duration):
+    """
+    Render and encode frames incrementally, returning a chunk generator
+    The first frame is rendered eagerly so render errors surface before
+    any bytes are sent
+    """
+    frames = iter_frames(frame_indices, options)
+    first = next(frames)
+    palette = gif_palette(first, frame_indices, options)
+    return stream_gif(
+        chain([first], frames), duration, first.width, first.height,
+        palette=palette, delta=options.get('encoding') == 'delta'
+    )
+
+def stream_rendered_image(frame_indices, options, duration, output):
+    """
+    Chunks of the requested output format; GIF streams frame by frame, while
+    WebP and APNG need every frame before encoding and arrive as one chunk
+    """
+    if output['format'] == 'gif':
+        return stream_rendered_gif(frame_indices, options, duration)
+    frames = render_frames(frame_indices, options)
+    return iter([encode_animation(
+        frames, duration, output['format'], output['lossless'], output['quality'], output['effort']
+    )])
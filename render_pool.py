@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Render Pool
+Worker pool that rasterizes frames concurrently and returns them in order
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+# Pool configuration
+POOL_SIZE = int(os.environ.get('RENDER_POOL_SIZE', os.cpu_count() or 1))
+POOL_MODE = os.environ.get('RENDER_POOL_MODE', 'process').lower()  # process, thread or off
+MAX_PARALLEL = int(os.environ.get('RENDER_MAX_PARALLEL', POOL_SIZE))
+WARM_START = os.environ.get('RENDER_POOL_WARM', 'true').lower() == 'true'
+START_METHOD = os.environ.get('RENDER_POOL_START_METHOD', 'forkserver')
+
+_executor = None
+_executor_mode = None
+_lock = threading.Lock()
+
+def _warm_worker():
+    """Pre-import the render stack (cairosvg, Pillow) in each worker"""
+    import render  # noqa: F401
+
+def _ping(_):
+    """No-op task used to bring every worker up at pool creation"""
+    return os.getpid()
+
+def _rasterize_raw(frame_id, options):
+    """Process worker task: rasterize one frame and return raw pixel data"""
+    from metrics import capture_stages
+    from render import rasterize_frame
+    with capture_stages() as stages:
+        img = rasterize_frame(frame_id, options)
+    return img.mode, img.size, img.tobytes(), stages
+
+def _mp_context():
+    """Multiprocessing context; forkserver keeps workers out of threaded server state"""
+    try:
+        ctx = multiprocessing.get_context(START_METHOD)
+    except ValueError:
+        ctx = multiprocessing.get_context('spawn')
+    if ctx.get_start_method() == 'forkserver':
+        ctx.set_forkserver_preload(['render'])
+    return ctx
+
+def _create_executor(mode):
+    """Create a process pool, falling back to threads where processes are unavailable"""
+    if mode == 'process':
+        executor = None
+        try:
+            executor = ProcessPoolExecutor(
+                max_workers=POOL_SIZE,
+                mp_context=_mp_context(),
+                initializer=_warm_worker
+            )
+            if WARM_START:
+                list(executor.map(_ping, range(POOL_SIZE)))
+            return executor, 'process'
+        except (OSError, EOFError, ValueError, NotImplementedError, BrokenProcessPool):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+    executor = ThreadPoolExecutor(
+        max_workers=POOL_SIZE,
+        thread_name_prefix='render',
+        initializer=_warm_worker
+    )
+    return executor, 'thread'
+
+def get_executor():
+    """Return the shared executor, creating it on first use"""
+    global _executor, _executor_mode
+    with _lock:
+        if _executor is None:
+            _executor, _executor_mode = _create_executor(POOL_MODE)
+        return _executor, _executor_mode
+
+def _fall_back_to_threads(broken):
+    """Replace a broken process pool with a thread pool"""
+    global _executor, _executor_mode
+    with _lock:
+        if _executor is broken:
+            _executor, _executor_mode = _create_executor('thread')
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def shutdown():
+    """Stop the shared executor"""
+    global _executor, _executor_mode
+    with _lock:
+        executor, _executor, _executor_mode = _executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(shutdown)
+
+def _imap_ordered(executor, mode, frame_ids, options, max_parallel):
+    """Keep at most max_parallel tasks in flight and yield results in order"""
+    from PIL import Image
+    from metrics import replay_stages
+    from render import rasterize_frame
+
+    task = _rasterize_raw if mode == 'process' else rasterize_frame
+    pending = deque()
+    ids = iter(frame_ids)
+    for frame_id in islice(ids, max_parallel):
+        pending.append(executor.submit(task, frame_id, options))
+    try:
+        while pending:
+            result = pending.popleft().result()
+            if mode == 'process':
+                img_mode, size, data, stages = result
+                replay_stages(stages)
+                result = Image.frombytes(img_mode, size, data)
+            frame_id = next(ids, None)
+            if frame_id is not None:
+                pending.append(executor.submit(task, frame_id, options))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+def imap_frames(frame_ids, options, max_parallel=None):
+    """Rasterize frames concurrently, yielding PIL images in input order as they finish"""
+    from render import rasterize_frame
+
+    max_parallel = max(1, min(max_parallel or MAX_PARALLEL, POOL_SIZE))
+    if len(frame_ids) <= 1 or max_parallel <= 1 or POOL_MODE == 'off':
+        for frame_id in frame_ids:
+            yield rasterize_frame(frame_id, options)
+        return
+
+    executor, mode = get_executor()
+    done = 0
+    try:
+        for img in _imap_ordered(executor, mode, frame_ids, options, max_parallel):
+            done += 1
+            yield img
+    except BrokenProcessPool:
+        _fall_back_to_threads(executor)
+        executor, mode = get_executor()
+        yield from _imap_ordered(executor, mode, frame_ids[done:], options, max_parallel)
+
+def rasterize_frames(frame_ids, options, max_parallel=None):
+    """Rasterize frames concurrently, returning PIL images in input order"""
+    return list(imap_frames(frame_ids, options, max_parallel))
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Request Options
+Parses marketing request parameters into frame indices and render options
+"""
+
+import math
+import os
+import random
+import urllib.parse
+
+from batch import STILL_FORMATS, WEBP_MAX_DIMENSION, sheet_layout
+from generate_marketing import DEFAULT_COMPANY, DEFAULT_SERVICES, FRAME_SPACE
+from prerender import parse_frame_spec
+from render import (
+    DEFAULT_RENDERER, ENCODING_MODES, FRAME_HEIGHT, FRAME_WIDTH, IMAGE_FORMATS, MAX_WIDTH, MIN_WIDTH,
+    PALETTE_MODES, RENDERERS
+)
+from sampler import FrameSampler
+
+# Most frames one batch export may render
+BATCH_MAX_FRAMES = int(os.environ.get('BATCH_MAX_FRAMES', 256))
+# Largest sprite sheet, in pixels (default: a full batch of 400x480 frames, about 150 MB as RGB)
+BATCH_MAX_PIXELS = int(os.environ.get('BATCH_MAX_PIXELS', 256 * FRAME_WIDTH * FRAME_HEIGHT))
+
+class ParameterError(ValueError):
+    """Request parameter outside its allowed range"""
+
+def parse_services(services_param):
+    """Parse comma-separated services list"""
+    if not services_param:
+        return DEFAULT_SERVICES
+    
+    services = [s.strip() for s in services_param.split(',')]
+    services = [urllib.parse.unquote(s) for s in services if s]
+    
+    return services[:10]  # Max 10 services
+
+def get_frame_indices(count, random_mode, seed=None, offset=0):
+    """Get frame indices based on mode, starting offset positions into the sequence"""
+    if random_mode:
+        return FrameSampler(seed or None).page(offset, count)
+    else:
+        return list(range(offset, offset + count))
+
+def parse_width(args):
+    """Output width from 'width' (pixels) or 'scale' (multiple of 400), default 400"""
+    if args.get('width'):
+        width = int(args.get('width'))
+    elif args.get('scale'):
+        scale = float(args.get('scale'))
+        if not math.isfinite(scale):
+            raise ParameterError("'scale' must be a finite number")
+        width = round(FRAME_WIDTH * scale)
+    else:
+        return FRAME_WIDTH
+    if width < MIN_WIDTH or width > MAX_WIDTH:
+        raise ParameterError(f"'width' must be between {MIN_WIDTH}-{MAX_WIDTH} (scale {MIN_WIDTH / FRAME_WIDTH:g}-{MAX_WIDTH / FRAME_WIDTH:g})")
+    return width
+
+def parse_render_options(args, total_frames):
+    """Build the render options dict from text and visual parameters"""
+    # Text parameters
+    company = args.get('company', DEFAULT_COMPANY)
+    services_param = args.get('services')
+    services = parse_services(services_param)
+    tagline = args.get('tagline')
+    url = args.get('url')
+    
+    # Visual parameters
+    bg_color = args.get('bg')
+    text_color = args.get('text')
+    accent_color = args.get('accent')
+    font = args.get('font', 'bold')
+    geometry = args.get('geometry', 'mixed')
+    palette = args.get('palette', 'per-frame')
+    encoding = args.get('encoding', 'full')
+    renderer = args.get('renderer', DEFAULT_RENDERER)
+    
+    # Build options dict
+    return {
+        'total_frames': total_frames,
+        'company': company[:50],  # Limit length
+        'services': services,
+        'tagline': tagline[:100] if tagline else None,
+        'url': url.replace('http://', '').replace('https://', '')[:50] if url else None,
+        'bg_color': bg_color,
+        'text_color': text_color,
+        'accent_color': accent_color,
+        'font': font if font in ['bold', 'tech', 'elegant', 'blocky', 'script'] else 'bold',
+        'geometry': geometry if geometry in ['sharp', 'round', 'mixed', 'minimal'] else 'mixed',
+        'palette': palette if palette in PALETTE_MODES else 'per-frame',
+        'encoding': encoding if encoding in ENCODING_MODES else 'full',
+        'renderer': renderer if renderer in RENDERERS else DEFAULT_RENDERER,
+        'width': parse_width(args),
+        'contrast': 'auto'
+    }
+
+def parse_marketing_request(args):
+    """
+    Parse query parameters into frame indices, render options and duration
+
+    Returns (frame_indices, options, duration, cacheable); cacheable is False
+    when the output is not determined by the parameters alone (surprise mode
+    and unseeded random mode).
+    """
+    count_param = args.get('count', '3')
+    random_mode = args.get('random', 'false').lower() == 'true'
+    frame_param = args.get('frame')
+    seed_param = args.get('seed')
+    duration = int(args.get('duration', 1000))
+    cacheable = True
+    
+    # Determine frame indices
+    if frame_param:
+        # Specific frame(s)
+        if ',' in frame_param:
+            frame_indices = [int(f.strip()) for f in frame_param.split(',')]
+        else:
+            frame_indices = [int(frame_param)]
+    else:
+        # Count-based
+        if count_param == '0':
+            # Surprise mode
+            count = random.randint(10, 30)
+            random_mode = True
+            duration = random.randint(500, 1500)
+            cacheable = False
+        else:
+            count = int(count_param)
+        
+        if count < 1 or count > 100:
+            raise ParameterError("'count' must be between 1-100 (or 0 for surprise mode)")
+        
+        offset = int(args.get('offset', 0))
+        if offset < 0 or offset + count > FRAME_SPACE:
+            raise ParameterError(f"'offset' must be between 0-{FRAME_SPACE - count}")
+        
+        if random_mode and not seed_param:
+            cacheable = False
+        
+        frame_indices = get_frame_indices(count, random_mode, seed_param, offset)
+    
+    options = parse_render_options(args, len(frame_indices))
+    
+    return frame_indices, options, duration, cacheable
+
+# Formats offered through Accept negotiation, best first; GIF is the fallback
+NEGOTIATED_FORMATS = [('image/webp', 'webp'), ('image/apng', 'apng')]
+
+def negotiate_format(accept):
+    """Best format explicitly listed in an Accept header's (mimetype, quality) pairs"""
+    accepted = {mimetype for mimetype, quality in accept if quality > 0}
+    for mimetype, fmt in NEGOTIATED_FORMATS:
+        if mimetype in accepted:
+            return fmt
+    return 'gif'
+
+def parse_output_format(args, accept=()):
+    """
+    Output format and encoder settings: an explicit format= wins, otherwise
+    the Accept header decides
+
+    Returns (output, negotiated); negotiated is True when Accept chose the format
+    """
+    fmt = args.get('format')
+    negotiated = not fmt
+    if negotiated:
+        fmt = negotiate_format(accept)
+    if fmt not in IMAGE_FORMATS:
+        raise ParameterError(f"'format' must be one of: {', '.join(IMAGE_FORMATS)}")
+    return {'format': fmt, **parse_encoder_settings(args)}, negotiated
+
+def parse_encoder_settings(args):
+    """WebP/PNG encoder settings: lossless, quality (0-100) and effort (0-6)"""
+    quality = int(args.get('quality', 80))
+    effort = int(args.get('effort', 4))
+    if quality < 0 or quality > 100:
+        raise ParameterError("'quality' must be between 0-100")
+    if effort < 0 or effort > 6:
+        raise ParameterError("'effort' must be between 0-6")
+    return {
+        'lossless': args.get('lossless', 'false').lower() == 'true',
+        'quality': quality,
+        'effort': effort
+    }
+
+def parse_batch_request(args, fmt=None, sheet=True):
+    """
+    Parse batch export parameters: frames (ids and ranges such as '0-99' or
+    '0-9,100-109'), the usual text and visual parameters, and image settings
+
+    fmt overrides the format= parameter (the sheet endpoints fix it by extension).
+    With sheet, the sprite sheet must fit BATCH_MAX_PIXELS (and WebP's side limit).
+    Returns (frame_ids, options, export, columns)
+    """
+    spec = args.get('frames')
+    if not spec:
+        raise ParameterError("'frames' is required, e.g. frames=0-99 or frames=5,9,12")
+    try:
+        frame_ids = parse_frame_spec(spec, limit=BATCH_MAX_FRAMES)
+    except ValueError as e:
+        raise ParameterError(f"'frames': {e}")
+    if not frame_ids:
+        raise ParameterError("'frames' must list at least one frame")
+    
+    columns = int(args.get('columns', 0)) or None
+    if columns is not None and (columns < 1 or columns > len(frame_ids)):
+        raise ParameterError(f"'columns' must be between 1-{len(frame_ids)}")
+    
+    fmt = fmt or args.get('format', 'png')
+    if fmt not in STILL_FORMATS:
+        raise ParameterError(f"'format' must be one of: {', '.join(STILL_FORMATS)}")
+    
+    options = parse_render_options(args, len(frame_ids))
+    if sheet:
+        layout = sheet_layout(frame_ids, options, columns)
+        if layout['width'] * layout['height'] > BATCH_MAX_PIXELS:
+            raise ParameterError(
+                f"sprite sheet of {layout['width']}x{layout['height']} exceeds {BATCH_MAX_PIXELS} pixels; "
+                "use fewer frames, a smaller width or the .zip export"
+            )
+        if fmt == 'webp' and max(layout['width'], layout['height']) > WEBP_MAX_DIMENSION:
+            raise ParameterError(
+                f"WebP sheets are limited to {WEBP_MAX_DIMENSION}px per side; use other columns or PNG"
+            )
+    return frame_ids, options, {'format': fmt, **parse_encoder_settings(args)}, columns
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Frame Sampler
+Stateless keyed permutation of the frame space for random mode
+
+The seed keys a small Feistel network over the next power-of-four domain.
+Positions that land outside the frame space are walked through the
+permutation again until they land inside it, so every position maps to
+a distinct frame id. Nothing is shared between requests, so concurrent
+samplers need no locks, and any page of a sequence can be computed on its
+own in O(1) memory.
+"""
+
+import hashlib
+import secrets
+
+from generate_marketing import FRAME_SPACE
+
+ROUNDS = 6
+MASK64 = (1 << 64) - 1
+
+def derive_round_keys(seed, rounds=ROUNDS):
+    """64-bit round keys from a seed string; None draws a fresh random key"""
+    material = secrets.token_bytes(32) if seed is None else str(seed).encode('utf-8')
+    digest = hashlib.blake2b(material, digest_size=8 * rounds, person=b'frame-sampler').digest()
+    return tuple(int.from_bytes(digest[i:i + 8], 'little') for i in range(0, len(digest), 8))
+
+def mix(value, key):
+    """Keyed 64-bit mixer (splitmix64 finalizer) used as the Feistel round function"""
+    value = (value ^ key) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+class FrameSampler:
+    """
+    Bijective map from sequence position to frame id for one seed
+    sampler.frame(i) is the i-th frame of the seed's sequence; positions
+    0..size-1 visit every frame exactly once, so any count of frames is
+    free of repeats
+    """
+
+    def __init__(self, seed=None, size=FRAME_SPACE):
+        self.size = size
+        self.keys = derive_round_keys(seed)
+        # Balanced halves over the smallest even bit width covering size
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+
+    def _permute(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ (mix(right, key) & self.half_mask)
+        return (left << self.half_bits) | right
+
+    def frame(self, position):
+        """Frame id at position in this seed's sequence"""
+        if not 0 <= position < self.size:
+            raise IndexError(f"position {position} outside 0-{self.size - 1}")
+        value = self._permute(position)
+        # Cycle-walk out of the padding; the domain is under 4x size so this is short
+        while value >= self.size:
+            value = self._permute(value)
+        return value
+
+    def page(self, start, count):
+        """Frame ids at positions start..start+count-1"""
+        return [self.frame(position) for position in range(start, start + count)]
@@ -4,48 +4,170 @@ Dynamic Marketing GIF Server
 Complete marketing GIF generation with full customization
 """
 
-from flask import Flask, Response, request
+from flask import Flask, Response, jsonify, request, url_for
 from flask_cors import CORS
 import os
-import random
 import urllib.parse
-from io import BytesIO
 
-try:
-    import cairosvg
-    HAS_CAIRO = True
-except ImportError:
-    HAS_CAIRO = False
-
-try:
-    from PIL import Image
-    HAS_PIL = True
-except ImportError:
-    HAS_PIL = False
-
-from generate_marketing import generate_marketing_svg, DEFAULT_COMPANY, DEFAULT_SERVICES
+from admission import Overloaded, RenderBudget
+from batch import STILL_FORMATS, render_sheet, sheet_layout, stream_zip
+from cache import GifCache, canonical_key
+from generate_marketing import build_color_tables
+from jobs import JobQueue, JobStore, QueueFull
+from metrics import ERRORS_TOTAL, RESPONSES_TOTAL, Collected, count_output, render_metrics
+from singleflight import SingleFlight
+from render import (
+    FRAME_HEIGHT, FRAME_WIDTH, HAS_CAIRO, HAS_NUMPY, HAS_PIL, IMAGE_FORMATS, VARIANT_BASE_WIDTH,
+    frame_cache, frame_size, stream_rendered_gif, stream_rendered_image
+)
+from request_options import ParameterError, parse_batch_request, parse_marketing_request, parse_output_format
 
 app = Flask(__name__)
 CORS(app)
 
-def parse_services(services_param):
-    """Parse comma-separated services list"""
-    if not services_param:
-        return DEFAULT_SERVICES
-    
-    services = [s.strip() for s in services_param.split(',')]
-    services = [urllib.parse.unquote(s) for s in services if s]
-    
-    return services[:10]  # Max 10 services
+# Finished-GIF cache: in-memory LRU plus optional on-disk tier (GIF_CACHE_DIR)
+gif_cache = GifCache(
+    max_bytes=int(os.environ.get('GIF_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    disk_dir=os.environ.get('GIF_CACHE_DIR'),
+    disk_max_bytes=int(os.environ.get('GIF_CACHE_DISK_MAX_BYTES', 1024 * 1024 * 1024))
+)
+
+# Render admission: in-flight cost is frames x pixels, capped at RENDER_BUDGET_FRAMES full frames
+render_budget = RenderBudget(
+    max_cost=int(os.environ.get('RENDER_BUDGET_FRAMES', 200)) * FRAME_WIDTH * FRAME_HEIGHT,
+    max_queue=int(os.environ.get('RENDER_QUEUE_SIZE', 32)),
+    max_wait=float(os.environ.get('RENDER_QUEUE_TIMEOUT', 10))
+)
+
+def render_cost(frame_indices, options):
+    """Admission cost of a render: distinct frames x pixels rasterized per frame"""
+    # Thumbnails are derived from a base-width render, which is what costs
+    width, height = frame_size(dict(options, width=max(options['width'], VARIANT_BASE_WIDTH)))
+    return len(set(frame_indices)) * width * height
+
+# GIF output, as always served by /marketing.gif
+GIF_OUTPUT = {'format': 'gif'}
+
+def admitted_render(frame_indices, options, duration, output=GIF_OUTPUT):
+    """Streamed image render holding its share of the render budget until done"""
+    return render_budget.guard(
+        render_cost(frame_indices, options),
+        lambda: count_output(
+            stream_rendered_image(frame_indices, options, duration, output), output['format']
+        )
+    )
+
+def image_cache_key(frame_indices, options, duration, output):
+    """Canonical key for an image; GIF keeps the key it had before other formats existed"""
+    if output['format'] == 'gif':
+        return canonical_key(frame_indices, options, duration)
+    return canonical_key(frame_indices, options, duration, output)
+
+# Identical concurrent renders share one in-progress stream
+render_flights = SingleFlight()
 
-def get_frame_indices(count, random_mode, seed=None):
-    """Get frame indices based on mode"""
-    if random_mode:
-        if seed:
-            random.seed(seed)
-        return random.sample(range(3110400), min(count, 3110400))
-    else:
-        return list(range(count))
+# Background renders for clients that poll instead of holding a connection.
+# Job records and results live in JOB_DIR (default: GIF_CACHE_DIR/jobs) so any
+# worker process can answer a poll
+JOB_DIR = os.environ.get('JOB_DIR') or (
+    os.path.join(os.environ['GIF_CACHE_DIR'], 'jobs') if os.environ.get('GIF_CACHE_DIR') else None
+)
+job_queue = JobQueue(
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_queued=int(os.environ.get('JOB_QUEUE_SIZE', 64)),
+    ttl=int(os.environ.get('JOB_TTL', 600)),
+    store=JobStore(JOB_DIR) if JOB_DIR else None
+)
+
+# Scrape-time views of cache, admission, coalescing and job state
+Collected(
+    'marketing_cache_lookups_total', 'Cache lookups by cache and result', 'counter',
+    lambda: [
+        ((name, result), cache.stats()[result])
+        for name, cache in (('gif', gif_cache.memory), ('frame', frame_cache))
+        for result in ('hits', 'misses')
+    ],
+    ['cache', 'result']
+)
+Collected(
+    'marketing_cache_bytes', 'Bytes held by each in-memory cache', 'gauge',
+    lambda: [(('gif',), gif_cache.memory.current_bytes), (('frame',), frame_cache.current_bytes)],
+    ['cache']
+)
+Collected(
+    'marketing_render_queue_depth', 'Renders waiting for admission', 'gauge',
+    lambda: [((), render_budget.stats()['queue_depth'])]
+)
+Collected(
+    'marketing_render_in_flight_cost', 'Pixels of admitted in-flight renders', 'gauge',
+    lambda: [((), render_budget.stats()['in_flight_cost'])]
+)
+Collected(
+    'marketing_render_rejected_total', 'Renders refused by admission control', 'counter',
+    lambda: [((), render_budget.stats()['rejected'])]
+)
+Collected(
+    'marketing_singleflight_requests_total', 'Deterministic renders by role (leader or coalesced)', 'counter',
+    lambda: [(('leader',), render_flights.leaders), (('coalesced',), render_flights.coalesced)],
+    ['role']
+)
+Collected(
+    'marketing_jobs', 'Background render jobs by state', 'gauge',
+    lambda: [((state,), count) for state, count in job_queue.stats().items() if state != 'queue_depth'],
+    ['state']
+)
+
+# Browser/CDN freshness lifetime for deterministic images (seconds)
+IMAGE_MAX_AGE = int(os.environ.get('IMAGE_MAX_AGE', 86400))
+
+def libraries_missing(options):
+    """True when the render stack a request needs is not installed (raster needs only Pillow, layered also NumPy)"""
+    if options['renderer'] == 'layered' and not HAS_NUMPY:
+        return True
+    return not HAS_PIL or (options['renderer'] == 'cairosvg' and not HAS_CAIRO)
+
+def warm_up():
+    """
+    Build the color tables and render one frame so the first request starts hot
+    Run once in the prefork master (see gunicorn_conf.py): workers inherit the
+    tables, imported render stack and cached frame copy-on-write
+    """
+    build_color_tables()
+    frame_indices, options, duration, _ = parse_marketing_request({'count': '1'})
+    if libraries_missing(options):
+        return
+    # A single frame renders inline, so no render pool is started before the fork
+    for _ in stream_rendered_gif(frame_indices, options, duration):
+        pass
+
+def caching_headers(cache_key):
+    """
+    Validator and freshness headers for an image response
+    Deterministic output gets a strong ETag (the canonical cache key) and is
+    publicly cacheable; random output must never be reused
+    """
+    if cache_key is None:
+        return {'Cache-Control': 'no-store', 'Vary': '*'}
+    return {
+        'ETag': f'"{cache_key}"',
+        'Cache-Control': f'public, max-age={IMAGE_MAX_AGE}'
+    }
+
+@app.after_request
+def record_response(response):
+    """Count image responses by cache outcome and errors by endpoint"""
+    if response.status_code == 304:
+        RESPONSES_TOTAL.inc(cache='NOT_MODIFIED')
+    elif 'X-Cache' in response.headers:
+        RESPONSES_TOTAL.inc(cache=response.headers['X-Cache'])
+    if response.status_code >= 400:
+        ERRORS_TOTAL.inc(endpoint=request.endpoint or 'unknown', status=str(response.status_code))
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -146,13 +268,13 @@ def index():
             
             <div class="gif-demo">
                 <h3>Simple (3 frames)</h3>
-                <img src="/marketing.gif?count=3" width="200">
+                <img src="/marketing.gif?count=3&width=200" width="200">
                 <p><code>/marketing.gif?count=3</code></p>
             </div>
             
             <div class="gif-demo">
                 <h3>Custom Company</h3>
-                <img src="/marketing.gif?count=3&company=TechCorp&services=Web,Mobile,Cloud" width="200">
+                <img src="/marketing.gif?count=3&company=TechCorp&services=Web,Mobile,Cloud&width=200" width="200">
                 <p><code>/marketing.gif?count=3&company=TechCorp&services=Web,Mobile,Cloud</code></p>
             </div>
             
@@ -165,6 +287,7 @@ def index():
                 <tr><td class="param">random</td><td>true/false</td><td>Random sampling from 3.1M space</td></tr>
                 <tr><td class="param">frame</td><td>0-3110399</td><td>Specific frame ID(s), comma-separated</td></tr>
                 <tr><td class="param">seed</td><td>text</td><td>Seed for reproducible random</td></tr>
+                <tr><td class="param">offset</td><td>0-3110399</td><td>Start position in the frame sequence (paging)</td></tr>
                 <tr><td class="param">duration</td><td>milliseconds</td><td>Frame duration (default: 1000)</td></tr>
             </table>
             
@@ -185,8 +308,28 @@ def index():
                 <tr><td class="param">accent</td><td>yellow, purple</td><td>Accent color</td></tr>
                 <tr><td class="param">font</td><td>bold, tech, elegant, blocky, script</td><td>Font style</td></tr>
                 <tr><td class="param">geometry</td><td>sharp, round, mixed, minimal</td><td>Geometric style</td></tr>
+                <tr><td class="param">palette</td><td>per-frame, global, adaptive</td><td>GIF palette strategy</td></tr>
+                <tr><td class="param">encoding</td><td>full, delta</td><td>Delta encodes only changed regions</td></tr>
+                <tr><td class="param">renderer</td><td>cairosvg, raster, layered</td><td>raster draws frames directly with Pillow; layered composites cached layers</td></tr>
+                <tr><td class="param">width</td><td>40-1600</td><td>Output width in pixels (height keeps 5:6)</td></tr>
+                <tr><td class="param">scale</td><td>0.1-4</td><td>Output size as a multiple of 400x480</td></tr>
             </table>
             
+            <h3>Output Format (/marketing)</h3>
+            <table>
+                <tr><th>Parameter</th><th>Values</th><th>Description</th></tr>
+                <tr><td class="param">format</td><td>gif, webp, apng</td><td>Defaults to the best format in the Accept header</td></tr>
+                <tr><td class="param">lossless</td><td>true/false</td><td>Lossless WebP</td></tr>
+                <tr><td class="param">quality</td><td>0-100</td><td>Lossy WebP quality (default: 80)</td></tr>
+                <tr><td class="param">effort</td><td>0-6</td><td>Encoder effort (default: 4)</td></tr>
+            </table>
+            
+            <h3>Batch Export</h3>
+            <div class="example">
+                <code>/frames.png?frames=0-47&width=100</code>
+                <p style="margin-top: 10px;">Sprite sheet of many frames; <code>/frames.json</code> maps frame positions, <code>/frames.zip</code> returns one image per frame</p>
+            </div>
+            
             <h2>💡 Usage Examples</h2>
             
             <div class="example">
@@ -245,116 +388,231 @@ def index():
 @app.route('/marketing.gif')
 def serve_marketing_gif():
     """Generate and serve marketing GIF"""
+    return serve_image(lambda: (GIF_OUTPUT, False))
+
+@app.route('/marketing')
+def serve_marketing_image():
+    """Marketing animation as GIF, animated WebP or APNG (format= or Accept negotiation)"""
+    return serve_image(lambda: parse_output_format(request.args, request.accept_mimetypes))
+
+def serve_image(choose_output):
+    """
+    Shared handler for the image endpoints
+    choose_output() returns (output, negotiated) and may raise ParameterError
+    """
     
-    if not HAS_CAIRO or not HAS_PIL:
+    try:
+        frame_indices, options, duration, cacheable = parse_marketing_request(request.args)
+        output, negotiated = choose_output()
+        mimetype = IMAGE_FORMATS[output['format']]
+        
+        if libraries_missing(options):
+            return Response(
+                "Error: Required libraries missing. Install: pip install cairosvg pillow",
+                status=500,
+                mimetype='text/plain'
+            )
+        
+        cache_key = image_cache_key(frame_indices, options, duration, output) if cacheable else None
+        headers = caching_headers(cache_key)
+        if negotiated and cache_key:
+            headers['Vary'] = 'Accept'
+        
+        # Client already holds this exact image
+        if cache_key and request.if_none_match.contains_weak(cache_key):
+            return Response(status=304, headers=headers)
+        
+        # Serve identical requests from cache without touching cairo or Pillow
+        if cache_key:
+            image_data = gif_cache.get(cache_key)
+            if image_data is not None:
+                return Response(image_data, mimetype=mimetype, headers={**headers, 'X-Cache': 'HIT'})
+        
+        # Stream frames to the client as they are rendered
+        if not cache_key:
+            chunks = admitted_render(frame_indices, options, duration, output)
+            return Response(chunks, mimetype=mimetype, headers={**headers, 'X-Cache': 'BYPASS'})
+        
+        # Requests arriving mid-render replay the leader's stream
+        chunks, leader = render_flights.stream(
+            cache_key,
+            lambda: gif_cache.store_stream(cache_key, admitted_render(frame_indices, options, duration, output))
+        )
         return Response(
-            "Error: Required libraries missing. Install: pip install cairosvg pillow",
+            chunks,
+            mimetype=mimetype,
+            headers={**headers, 'X-Cache': 'MISS' if leader else 'COALESCED'}
+        )
+        
+    except ParameterError as e:
+        return Response(
+            f"Error: {str(e)}",
+            status=400,
+            mimetype='text/plain'
+        )
+    except ValueError as e:
+        return Response(
+            f"Error: Invalid parameter value - {str(e)}",
+            status=400,
+            mimetype='text/plain'
+        )
+    except Overloaded as e:
+        return Response(
+            f"Error: Server busy - {str(e)}",
+            status=429,
+            mimetype='text/plain',
+            headers={'Retry-After': str(e.retry_after)}
+        )
+    except Exception as e:
+        return Response(
+            f"Error generating image: {str(e)}",
             status=500,
             mimetype='text/plain'
         )
+
+@app.route('/frames.<ext>')
+def export_frames(ext):
+    """
+    Batch export of many frames in one response: a sprite sheet (.png/.webp),
+    its coordinate map (.json) or a ZIP of per-frame images (.zip)
+    """
+    if ext not in ('json', 'zip') and ext not in STILL_FORMATS:
+        return Response("Error: Unknown export; use .png, .webp, .json or .zip", status=404, mimetype='text/plain')
     
     try:
-        # Parse parameters
-        count_param = request.args.get('count', '3')
-        random_mode = request.args.get('random', 'false').lower() == 'true'
-        frame_param = request.args.get('frame')
-        seed_param = request.args.get('seed')
-        duration = int(request.args.get('duration', 1000))
+        frame_ids, options, export, columns = parse_batch_request(
+            request.args, ext if ext in STILL_FORMATS else None, sheet=ext != 'zip'
+        )
         
-        # Text parameters
-        company = request.args.get('company', DEFAULT_COMPANY)
-        services_param = request.args.get('services')
-        services = parse_services(services_param)
-        tagline = request.args.get('tagline')
-        url = request.args.get('url')
+        # The map is pure layout, so it is answered without rendering anything
+        if ext == 'json':
+            layout = sheet_layout(frame_ids, options, columns)
+            # Append the query by hand: as url_for keywords, 'ext' collides with the path's and '_external' is an option
+            query = urllib.parse.urlencode([(k, v) for k, v in request.args.items(multi=True) if k != 'ext'])
+            layout['image'] = url_for('export_frames', ext=export['format']) + (f"?{query}" if query else '')
+            return jsonify(layout)
         
-        # Visual parameters
-        bg_color = request.args.get('bg')
-        text_color = request.args.get('text')
-        accent_color = request.args.get('accent')
-        font = request.args.get('font', 'bold')
-        geometry = request.args.get('geometry', 'mixed')
+        if libraries_missing(options):
+            return Response(
+                "Error: Required libraries missing. Install: pip install cairosvg pillow",
+                status=500,
+                mimetype='text/plain'
+            )
         
-        # Determine frame indices
-        if frame_param:
-            # Specific frame(s)
-            if ',' in frame_param:
-                frame_indices = [int(f.strip()) for f in frame_param.split(',')]
-            else:
-                frame_indices = [int(frame_param)]
-        else:
-            # Count-based
-            if count_param == '0':
-                # Surprise mode
-                count = random.randint(10, 30)
-                random_mode = True
-                duration = random.randint(500, 1500)
-            else:
-                count = int(count_param)
-            
-            if count < 1 or count > 100:
-                return Response(
-                    "Error: 'count' must be between 1-100 (or 0 for surprise mode)",
-                    status=400,
-                    mimetype='text/plain'
-                )
-            
-            frame_indices = get_frame_indices(count, random_mode, seed_param)
+        cache_key = canonical_key('frames', ext, frame_ids, options, export, columns)
+        headers = caching_headers(cache_key)
+        if request.if_none_match.contains_weak(cache_key):
+            return Response(status=304, headers=headers)
         
-        # Build options dict
-        options = {
-            'total_frames': len(frame_indices),
-            'company': company[:50],  # Limit length
-            'services': services,
-            'tagline': tagline[:100] if tagline else None,
-            'url': url.replace('http://', '').replace('https://', '')[:50] if url else None,
-            'bg_color': bg_color,
-            'text_color': text_color,
-            'accent_color': accent_color,
-            'font': font if font in ['bold', 'tech', 'elegant', 'blocky', 'script'] else 'bold',
-            'geometry': geometry if geometry in ['sharp', 'round', 'mixed', 'minimal'] else 'mixed',
-            'contrast': 'auto'
-        }
+        if ext == 'zip':
+            mimetype = 'application/zip'
+            headers['Content-Disposition'] = 'attachment; filename=frames.zip'
+        else:
+            mimetype = STILL_FORMATS[ext]
         
-        # Generate frames
-        frames = []
-        for frame_id in frame_indices:
-            svg_content = generate_marketing_svg(frame_id, options)
-            png_data = cairosvg.svg2png(
-                bytestring=svg_content.encode('utf-8'),
-                output_width=400,
-                output_height=480
-            )
-            img = Image.open(BytesIO(png_data))
-            frames.append(img)
+        cached = gif_cache.get(cache_key)
+        if cached is not None:
+            return Response(cached, mimetype=mimetype, headers={**headers, 'X-Cache': 'HIT'})
         
-        # Create GIF
-        output = BytesIO()
-        frames[0].save(
-            output,
-            format='GIF',
-            save_all=True,
-            append_images=frames[1:],
-            duration=duration,
-            loop=0,
-            optimize=True
+        # Sheets need every frame before encoding; ZIP members stream as they are encoded
+        if ext == 'zip':
+            produce = lambda: stream_zip(frame_ids, options, export)
+        else:
+            layout = sheet_layout(frame_ids, options, columns)
+            produce = lambda: iter([render_sheet(frame_ids, options, layout, export)])
+        chunks = render_budget.guard(
+            render_cost(frame_ids, options),
+            lambda: count_output(produce(), ext)
+        )
+        return Response(
+            gif_cache.store_stream(cache_key, chunks),
+            mimetype=mimetype,
+            headers={**headers, 'X-Cache': 'MISS'}
         )
-        output.seek(0)
-        
-        return Response(output.read(), mimetype='image/gif')
         
+    except ParameterError as e:
+        return Response(f"Error: {str(e)}", status=400, mimetype='text/plain')
     except ValueError as e:
+        return Response(f"Error: Invalid parameter value - {str(e)}", status=400, mimetype='text/plain')
+    except Overloaded as e:
         return Response(
-            f"Error: Invalid parameter value - {str(e)}",
-            status=400,
-            mimetype='text/plain'
+            f"Error: Server busy - {str(e)}",
+            status=429,
+            mimetype='text/plain',
+            headers={'Retry-After': str(e.retry_after)}
         )
     except Exception as e:
+        return Response(f"Error exporting frames: {str(e)}", status=500, mimetype='text/plain')
+
+def job_status(job, status=200):
+    """JSON status document with links for polling"""
+    body = job.to_dict()
+    body['status_url'] = url_for('get_job', job_id=job.id)
+    body['result_url'] = url_for('get_job_result', job_id=job.id)
+    response = jsonify(body)
+    response.status_code = status
+    return response
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a GIF render; accepts the same parameters as /marketing.gif"""
+    
+    try:
+        frame_indices, options, duration, cacheable = parse_marketing_request(request.values)
+    except ParameterError as e:
+        return Response(f"Error: {str(e)}", status=400, mimetype='text/plain')
+    except ValueError as e:
+        return Response(f"Error: Invalid parameter value - {str(e)}", status=400, mimetype='text/plain')
+    
+    if libraries_missing(options):
         return Response(
-            f"Error generating GIF: {str(e)}",
+            "Error: Required libraries missing. Install: pip install cairosvg pillow",
             status=500,
             mimetype='text/plain'
         )
+    
+    key = canonical_key(frame_indices, options, duration)
+    
+    def render():
+        cached = gif_cache.get(key) if cacheable else None
+        if cached is not None:
+            return [cached]
+        chunks = stream_rendered_gif(frame_indices, options, duration)
+        return gif_cache.store_stream(key, chunks) if cacheable else chunks
+    
+    try:
+        job, created = job_queue.submit(key, len(frame_indices), render)
+    except QueueFull as e:
+        return Response(f"Error: {str(e)}", status=503, mimetype='text/plain', headers={'Retry-After': '5'})
+    
+    response = job_status(job, 202 if created else 200)
+    response.headers['Location'] = url_for('get_job', job_id=job.id)
+    return response
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Job status and progress"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return Response("Error: Unknown or expired job", status=404, mimetype='text/plain')
+    return job_status(job)
+
+@app.route('/jobs/<job_id>/result')
+def get_job_result(job_id):
+    """Finished GIF for a job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return Response("Error: Unknown or expired job", status=404, mimetype='text/plain')
+    if job.status == 'failed':
+        return Response(f"Error generating GIF: {job.error}", status=500, mimetype='text/plain')
+    if job.status != 'done':
+        response = job_status(job, 202)
+        response.headers['Retry-After'] = '1'
+        return response
+    result = job_queue.result(job)
+    if result is None:
+        return Response("Error: Unknown or expired job", status=404, mimetype='text/plain')
+    return Response(result, mimetype='image/gif')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Single-Flight Rendering
+Concurrent requests for the same canonical parameters share one in-progress render
+"""
+
+import threading
+
+class Flight:
+    """One in-progress render: the chunks produced so far and its outcome"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.followers = 0
+        self._cond = threading.Condition()
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def wait_started(self):
+        """Block until the first chunk exists, raising the leader's error if it failed first"""
+        with self._cond:
+            while not self.chunks and not self.done:
+                self._cond.wait()
+            if not self.chunks and self.error is not None:
+                raise self.error
+
+    def replay(self):
+        """Yield every chunk, published or still to come, in order"""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.chunks) and not self.done:
+                    self._cond.wait()
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            index += 1
+            yield chunk
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent streamed renders
+    The first request for a key (the leader) runs the render; requests that
+    arrive while it is in flight replay its chunks as they are produced.
+    If the leader's client disconnects, the render still completes for any
+    coalesced followers
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def stream(self, key, produce):
+        """
+        Chunks for key, from a new render via produce() or an in-flight one;
+        returns (chunks, leader)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+                self.leaders += 1
+            else:
+                flight.followers += 1
+                self.coalesced += 1
+
+        if not leader:
+            flight.wait_started()
+            return flight.replay(), False
+
+        try:
+            chunks = produce()
+        except BaseException as e:
+            self._land(key, flight, e)
+            raise
+        stream = self._lead(key, flight, chunks)
+        next(stream)
+        return stream, True
+
+    def _lead(self, key, flight, chunks):
+        """Pass the leader's chunks through, publishing each to followers"""
+        error = None
+        try:
+            # Primed by stream() so closing before iteration still lands the flight
+            yield
+            for chunk in chunks:
+                flight.publish(chunk)
+                yield chunk
+        except GeneratorExit:
+            # Leader's client went away: finish the render for anyone waiting on it
+            if self._abandon(key, flight):
+                error = ConnectionAbortedError('render abandoned')
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+            else:
+                try:
+                    for chunk in chunks:
+                        flight.publish(chunk)
+                except Exception as e:
+                    error = e
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._land(key, flight, error)
+
+    def _abandon(self, key, flight):
+        """Unregister a flight nobody is following; False if followers exist"""
+        with self._lock:
+            if flight.followers:
+                return False
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            return True
+
+    def _land(self, key, flight, error=None):
+        """Mark a flight finished and stop new requests joining it"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(error)
+
+    def stats(self):
+        """Snapshot of leader/coalesced counts"""
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._flights)
+            }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Admission Control Tests
+The render budget must shed load with 429 and Retry-After, and give every
+admitted cost back once its stream ends
+
+Run with: python -m pytest test_admission.py
+"""
+
+import threading
+import time
+import uuid
+
+import pytest
+
+from admission import Overloaded, RenderBudget
+
+def assert_released(budget):
+    stats = budget.stats()
+    assert stats['in_flight'] == 0
+    assert stats['in_flight_cost'] == 0
+    assert stats['queue_depth'] == 0
+
+def test_full_queue_is_shed_with_retry_after():
+    budget = RenderBudget(max_cost=100, max_queue=0, max_wait=2.5)
+    held = budget.acquire(60)
+    with pytest.raises(Overloaded) as shed:
+        budget.acquire(60)
+    assert shed.value.retry_after == 3
+    budget.release(held)
+    assert_released(budget)
+    assert budget.stats()['rejected'] == 1
+
+def test_queued_render_times_out():
+    budget = RenderBudget(max_cost=100, max_queue=1, max_wait=0.05)
+    held = budget.acquire(100)
+    with pytest.raises(Overloaded):
+        budget.acquire(1)
+    assert budget.stats()['timed_out'] == 1
+    budget.release(held)
+    assert_released(budget)
+
+def test_waiter_admitted_on_release():
+    budget = RenderBudget(max_cost=100, max_queue=1, max_wait=10)
+    held = budget.acquire(100)
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(budget.acquire(50)))
+    waiter.start()
+    while budget.stats()['queue_depth'] == 0:
+        time.sleep(0.001)
+    budget.release(held)
+    waiter.join(10)
+    assert admitted == [50]
+    budget.release(50)
+    assert_released(budget)
+
+def test_oversized_render_runs_alone():
+    budget = RenderBudget(max_cost=100)
+    held = budget.acquire(10 ** 9)
+    assert held == 100
+    budget.release(held)
+    assert_released(budget)
+
+def test_guard_releases_when_exhausted_closed_or_failed():
+    budget = RenderBudget(max_cost=100)
+
+    assert list(budget.guard(40, lambda: iter([b'a', b'b']))) == [b'a', b'b']
+    assert_released(budget)
+
+    budget.guard(40, lambda: iter([b'a'])).close()
+    assert_released(budget)
+
+    def fail():
+        raise RuntimeError('produce failed')
+    with pytest.raises(RuntimeError):
+        budget.guard(40, fail)
+    assert_released(budget)
+
+def test_server_returns_429_and_releases_budget(monkeypatch):
+    server = pytest.importorskip('server')
+    # Room for one 2-frame render at a time, and no queue
+    budget = RenderBudget(max_cost=2 * server.FRAME_WIDTH * server.FRAME_HEIGHT, max_queue=0, max_wait=4)
+    monkeypatch.setattr(server, 'render_budget', budget)
+    client = server.app.test_client()
+    company = f'Budget{uuid.uuid4().hex[:8]}'
+
+    # The first stream holds its budget until the body is read
+    first = client.get(f'/marketing.gif?count=2&renderer=raster&company={company}')
+    assert first.status_code == 200
+    assert budget.stats()['in_flight'] == 1
+
+    shed = client.get(f'/marketing.gif?count=2&renderer=raster&company={company}B')
+    assert shed.status_code == 429
+    assert shed.headers['Retry-After'] == '4'
+
+    assert first.get_data().startswith(b'GIF89a')
+    assert_released(budget)
+    assert client.get(f'/marketing.gif?count=2&renderer=raster&company={company}B').status_code == 200
+    assert_released(budget)
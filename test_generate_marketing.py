@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Frame ID Tests
+encode_frame_id must invert the frame decomposition exactly and reject
+components it cannot encode
+
+Run with: python -m pytest test_generate_marketing.py
+"""
+
+import pytest
+
+from generate_marketing import (
+    BG_STYLES, FONT_NAMES, FRAME_SPACE, GEOMETRY_PATTERNS, HAS_NUMPY, encode_frame_id,
+    get_frame_components, get_frame_components_batch
+)
+
+@pytest.mark.skipif(not HAS_NUMPY, reason='NumPy not available')
+def test_round_trip_whole_frame_space():
+    import numpy as np
+
+    ids = np.arange(FRAME_SPACE)
+    columns = get_frame_components_batch(ids)
+    encoded = encode_frame_id(
+        columns['hue'], columns['bg_style_idx'], columns['geometry_idx'],
+        columns['service_idx'], columns['time_slot'], columns['font_idx']
+    )
+    assert np.array_equal(encoded, ids)
+
+@pytest.mark.parametrize('frame_id', [0, 1, 359, 360, 123456, 622080, FRAME_SPACE - 1])
+def test_round_trip_by_name(frame_id):
+    components = get_frame_components(frame_id)
+    assert encode_frame_id(
+        hue=components['hue'],
+        bg_style=components['bg_style'],
+        geometry=components['geometry'],
+        service_idx=components['service_idx'],
+        time_slot=components['time_slot'],
+        font=components['font']
+    ) == frame_id
+
+def test_batch_matches_scalar_decomposition():
+    ids = [0, 7, 2161, 999999, FRAME_SPACE - 1]
+    columns = get_frame_components_batch(ids)
+    for i, frame_id in enumerate(ids):
+        components = get_frame_components(frame_id)
+        assert int(columns['hue'][i]) == components['hue']
+        assert BG_STYLES[columns['bg_style_idx'][i]] == components['bg_style']
+        assert GEOMETRY_PATTERNS[columns['geometry_idx'][i]] == components['geometry']
+        assert FONT_NAMES[columns['font_idx'][i]] == components['font']
+
+@pytest.mark.parametrize('component', [
+    {'hue': -1}, {'hue': 360}, {'bg_style': 6}, {'geometry': 4}, {'service_idx': 3},
+    {'time_slot': 24}, {'font': 5}, {'font': -1}
+])
+def test_rejects_out_of_range(component):
+    with pytest.raises(ValueError):
+        encode_frame_id(**component)
+
+@pytest.mark.parametrize('component', [
+    {'hue': 1.5}, {'hue': 120.0}, {'time_slot': '12'}, {'service_idx': None}, {'font': 'no-such-font'}
+])
+def test_rejects_non_integer(component):
+    with pytest.raises(ValueError):
+        encode_frame_id(**component)
+
+@pytest.mark.skipif(not HAS_NUMPY, reason='NumPy not available')
+def test_rejects_bad_arrays():
+    import numpy as np
+
+    with pytest.raises(ValueError):
+        encode_frame_id(hue=np.array([0, 360]))
+    with pytest.raises(ValueError):
+        encode_frame_id(hue=np.array([0.0, 1.5]))
+    assert list(encode_frame_id(hue=np.int64(0), bg_style=np.arange(6))) == [360 * i for i in range(6)]
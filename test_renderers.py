@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Renderer Visual Diff Tests
+The raster and layered renderers must stay visually close to the cairosvg
+reference output
+
+Run with: python -m pytest test_renderers.py
+The cairosvg comparison is skipped when cairosvg or libcairo is missing.
+"""
+
+import math
+
+import pytest
+from PIL import ImageChops, ImageStat
+
+from request_options import parse_render_options
+from render import HAS_CAIRO, HAS_NUMPY, rasterize_frame
+
+# Frames spread across the space: every bg style, geometry, time slot band and font
+SAMPLE_FRAMES = [0, 361, 2161, 8641, 25921, 130000, 622081, 1244161, 1866241, 2488321, 3110399]
+
+# raster vs cairosvg: fonts are substituted and cairosvg skips feGaussianBlur,
+# so text and glow pixels differ; gradients, shapes and layout must match
+MIN_PSNR_DB = 18.0
+MAX_MEAN_ABS_DIFF = 8.0
+
+def sample_options(renderer):
+    options = parse_render_options({
+        'company': 'TechCorp',
+        'services': 'Web,Mobile,Cloud',
+        'tagline': 'Build Faster',
+        'url': 'techcorp.io',
+        'renderer': renderer
+    }, len(SAMPLE_FRAMES))
+    return options
+
+def difference(reference, img):
+    """(mean absolute channel difference, max difference, PSNR in dB)"""
+    diff = ImageChops.difference(reference.convert('RGB'), img.convert('RGB'))
+    stat = ImageStat.Stat(diff)
+    rms = math.sqrt(sum(value ** 2 for value in stat.rms) / 3)
+    psnr = 20 * math.log10(255 / rms) if rms else float('inf')
+    return sum(stat.mean) / 3, max(hi for _, hi in diff.getextrema()), psnr
+
+@pytest.mark.skipif(not HAS_CAIRO, reason='cairosvg/libcairo not available')
+@pytest.mark.parametrize('frame_id', SAMPLE_FRAMES)
+def test_raster_matches_cairosvg(frame_id):
+    reference = rasterize_frame(frame_id, sample_options('cairosvg'))
+    img = rasterize_frame(frame_id, sample_options('raster'))
+    assert img.size == reference.size
+    mean_diff, _, psnr = difference(reference, img)
+    assert psnr >= MIN_PSNR_DB, f'frame {frame_id}: PSNR {psnr:.1f} dB'
+    assert mean_diff <= MAX_MEAN_ABS_DIFF, f'frame {frame_id}: mean abs diff {mean_diff:.2f}'
+
+@pytest.mark.skipif(not HAS_NUMPY, reason='NumPy not available')
+@pytest.mark.parametrize('frame_id', SAMPLE_FRAMES)
+def test_layered_matches_raster(frame_id):
+    reference = rasterize_frame(frame_id, sample_options('raster'))
+    img = rasterize_frame(frame_id, sample_options('layered'))
+    _, max_diff, _ = difference(reference, img)
+    # Same drawing code, composited differently: only rounding may differ
+    assert max_diff <= 1, f'frame {frame_id}: max diff {max_diff}'
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Frame Sampler Tests
+A seed's sequence must be a permutation of the frame space: every position maps
+to a distinct in-range frame id, and any page can be computed on its own
+
+Run with: python -m pytest test_sampler.py
+"""
+
+import pytest
+
+from generate_marketing import FRAME_SPACE
+from sampler import FrameSampler
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 16, 17, 100, 1000, 4097, 65536])
+@pytest.mark.parametrize('seed', ['a', 'campaign-42', None])
+def test_permutation_at_small_sizes(size, seed):
+    sampler = FrameSampler(seed, size=size)
+    assert sorted(sampler.page(0, size)) == list(range(size))
+
+def test_same_seed_same_sequence():
+    assert FrameSampler('spring').page(0, 50) == FrameSampler('spring').page(0, 50)
+    assert FrameSampler('spring').page(0, 50) != FrameSampler('summer').page(0, 50)
+
+def test_pages_match_positions():
+    sampler = FrameSampler('pages')
+    sequence = sampler.page(0, 30)
+    assert sampler.page(10, 20) == sequence[10:30]
+    assert [sampler.frame(i) for i in range(30)] == sequence
+
+def test_full_frame_space_in_range_without_repeats():
+    sampler = FrameSampler('full')
+    frames = sampler.page(FRAME_SPACE - 5000, 5000) + sampler.page(0, 5000)
+    assert len(set(frames)) == len(frames)
+    assert all(0 <= frame < FRAME_SPACE for frame in frames)
+
+@pytest.mark.parametrize('position', [-1, FRAME_SPACE])
+def test_position_out_of_range(position):
+    with pytest.raises(IndexError):
+        FrameSampler('x').frame(position)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Single-Flight Tests
+Identical concurrent renders must run once and stream the same bytes to every client
+
+Run with: python -m pytest test_singleflight.py
+"""
+
+import threading
+import time
+import uuid
+
+import pytest
+
+from singleflight import SingleFlight
+
+FOLLOWERS = 5
+
+def wait_for(condition, timeout=10.0):
+    """Poll until condition() holds, failing the test on timeout"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail('timed out waiting for concurrent requests')
+        time.sleep(0.005)
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def test_concurrent_streams_render_once():
+    flights = SingleFlight()
+    release = threading.Event()
+    renders = []
+
+    def produce():
+        renders.append(1)
+        def chunks():
+            release.wait(10)
+            yield b'header'
+            yield b'frame'
+        return chunks()
+
+    leader_chunks, leader = flights.stream('key', produce)
+    assert leader
+
+    results = []
+    def follow():
+        chunks, is_leader = flights.stream('key', produce)
+        results.append((is_leader, b''.join(chunks)))
+
+    threads = run_threads(follow, FOLLOWERS)
+    wait_for(lambda: flights.stats()['coalesced'] == FOLLOWERS)
+    release.set()
+    assert b''.join(leader_chunks) == b'headerframe'
+    for thread in threads:
+        thread.join(10)
+
+    assert len(renders) == 1
+    assert results == [(False, b'headerframe')] * FOLLOWERS
+    assert flights.stats() == {'leaders': 1, 'coalesced': FOLLOWERS, 'in_flight': 0}
+
+def test_leader_error_reaches_followers():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def chunks():
+        yield b'header'
+        release.wait(10)
+        raise RuntimeError('render failed')
+
+    leader_chunks, _ = flights.stream('key', chunks)
+    errors = []
+    def follow():
+        try:
+            b''.join(flights.stream('key', chunks)[0])
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = run_threads(follow, FOLLOWERS)
+    wait_for(lambda: flights.stats()['coalesced'] == FOLLOWERS)
+    assert next(leader_chunks) == b'header'
+    release.set()
+    with pytest.raises(RuntimeError):
+        b''.join(leader_chunks)
+    for thread in threads:
+        thread.join(10)
+
+    assert errors == ['render failed'] * FOLLOWERS
+    assert flights.stats()['in_flight'] == 0
+
+def test_concurrent_requests_coalesce():
+    server = pytest.importorskip('server')
+    client = server.app.test_client()
+    # A company no other test uses, so nothing is cached yet
+    url = f'/marketing.gif?count=3&renderer=raster&company=Flight{uuid.uuid4().hex[:8]}'
+    coalesced_before = server.render_flights.stats()['coalesced']
+
+    # The leader's render does not start until its body is read
+    leader = client.get(url)
+    assert leader.headers['X-Cache'] == 'MISS'
+
+    followers = []
+    def follow():
+        response = client.get(url)
+        followers.append((response.headers['X-Cache'], response.get_data()))
+
+    threads = run_threads(follow, FOLLOWERS)
+    wait_for(lambda: server.render_flights.stats()['coalesced'] - coalesced_before == FOLLOWERS)
+    body = leader.get_data()
+    for thread in threads:
+        thread.join(10)
+
+    assert body.startswith(b'GIF89a')
+    assert followers == [('COALESCED', body)] * FOLLOWERS
+    assert client.get(url).headers['X-Cache'] == 'HIT'